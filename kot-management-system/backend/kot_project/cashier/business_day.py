@@ -0,0 +1,58 @@
+# backend/kot_project/cashier/business_day.py
+"""
+Restaurant business days.
+
+A business day runs from BUSINESS_DAY_CUTOFF_HOUR on its date to the same
+hour the next day, in BUSINESS_DAY_TIME_ZONE - so a 1am bill still belongs
+to the evening before. Filters turn days into half-open [start, end)
+timestamp ranges, which the created_at / paid_at btree indexes can scan,
+instead of `__date` lookups that cast every row.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def business_timezone():
+    return ZoneInfo(getattr(settings, 'BUSINESS_DAY_TIME_ZONE', settings.TIME_ZONE))
+
+
+def cutoff_hour():
+    return getattr(settings, 'BUSINESS_DAY_CUTOFF_HOUR', 0)
+
+
+def business_day_for(moment):
+    """Business day an aware timestamp belongs to."""
+    local = moment.astimezone(business_timezone())
+    return (local - timedelta(hours=cutoff_hour())).date()
+
+
+def local_time_now():
+    """Current wall-clock time in the business time zone."""
+    return timezone.now().astimezone(business_timezone()).time()
+
+
+def current_business_day():
+    return business_day_for(timezone.now())
+
+
+def business_day_start(day):
+    """Aware datetime at which `day` opens."""
+    return datetime.combine(day, time(cutoff_hour()), tzinfo=business_timezone())
+
+
+def business_day_range(first, last=None):
+    """[start, end) covering business days first..last inclusive (last defaults to first)."""
+    last = first if last is None else last
+    return business_day_start(first), business_day_start(last + timedelta(days=1))
+
+
+def in_business_days(qs, field, first=None, last=None):
+    """Filter `field` to business days first..last; either end may be open."""
+    if first is not None:
+        qs = qs.filter(**{f'{field}__gte': business_day_start(first)})
+    if last is not None:
+        qs = qs.filter(**{f'{field}__lt': business_day_start(last + timedelta(days=1))})
+    return qs
@@ -0,0 +1,201 @@
+# backend/kot_project/cashier/events.py
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = 'order.created'
+ORDER_PAID = 'order.paid'
+ORDER_CANCELLED = 'order.cancelled'
+ORDER_REFUNDED = 'order.refunded'
+
+# Which event types each role is subscribed to. Waiters only ever see
+# events for their own orders (see Subscription.matches).
+ROLE_EVENTS = {
+    'admin': {ORDER_CREATED, ORDER_PAID, ORDER_CANCELLED, ORDER_REFUNDED},
+    'cashier': {ORDER_CREATED, ORDER_PAID, ORDER_CANCELLED, ORDER_REFUNDED},
+    'waiter': {ORDER_PAID, ORDER_CANCELLED, ORDER_REFUNDED},
+}
+
+
+class Subscription:
+    """
+    One listener on the broker. `deliver` is called with every matching
+    event, from whatever thread published it.
+    """
+
+    def __init__(self, deliver, order_id=None, role=None, waiter_id=None):
+        self.deliver = deliver
+        self.order_id = order_id
+        self.role = role
+        self.waiter_id = waiter_id
+
+    def matches(self, event):
+        if self.order_id is not None and event['order_id'] != self.order_id:
+            return False
+        if self.role is not None:
+            if event['type'] not in ROLE_EVENTS.get(self.role, ()):
+                return False
+            if self.role == 'waiter' and self.waiter_id is not None and event['waiter_id'] != self.waiter_id:
+                return False
+        return True
+
+
+class InProcessBroker:
+    """
+    Fan-out of order events to subscribers in the same process.
+
+    Enough for a single ASGI worker and for tests; with more than one
+    worker process use PostgresBroker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+
+    def subscribe(self, deliver, order_id=None, role=None, waiter_id=None):
+        subscription = Subscription(deliver, order_id=order_id, role=role, waiter_id=waiter_id)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event):
+        self.deliver_local(event)
+
+    def deliver_local(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.deliver(event)
+            except Exception:
+                # A dead listener must never break the write path
+                logger.exception("Dropping order event subscriber")
+                self.unsubscribe(subscription)
+
+
+def _notifications(raw, timeout):
+    """Payloads of NOTIFYs received on a raw psycopg connection within `timeout` seconds."""
+    if hasattr(raw, 'poll'):  # psycopg2
+        if select.select([raw], [], [], timeout)[0]:
+            raw.poll()
+            while raw.notifies:
+                yield raw.notifies.pop(0).payload
+    else:  # psycopg 3
+        for notify in raw.notifies(timeout=timeout):
+            yield notify.payload
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Order events across worker processes through Postgres LISTEN/NOTIFY.
+
+    publish() sends a NOTIFY on ORDER_EVENTS_CHANNEL. Every process with
+    stream subscribers runs one listener thread that LISTENs on its own
+    connection and fans events out to them, including events published by
+    the same process. NOTIFYs sent while a listener reconnects are lost;
+    clients catch up through the ?since= delta feed.
+    """
+    READY_TIMEOUT_SECONDS = 5
+    RECONNECT_SECONDS = 2
+
+    def __init__(self, channel=None):
+        super().__init__()
+        self.channel = channel or getattr(settings, 'ORDER_EVENTS_CHANNEL', 'order_events')
+        self._listener = None
+        self._listening = threading.Event()
+        self._stopping = threading.Event()
+
+    def subscribe(self, deliver, order_id=None, role=None, waiter_id=None):
+        subscription = super().subscribe(deliver, order_id=order_id, role=role, waiter_id=waiter_id)
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='order-events-listener', daemon=True)
+                self._listener.start()
+        self._listening.wait(self.READY_TIMEOUT_SECONDS)
+        return subscription
+
+    def publish(self, event):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, json.dumps(event)])
+        except Exception:
+            # Runs after commit: a lost event must never fail the request
+            logger.exception("Could not publish order event %s", event.get('type'))
+
+    def _listen(self):
+        # Django connections are per thread, so this one is the listener's own
+        while not self._stopping.is_set():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {connection.ops.quote_name(self.channel)}")
+                self._listening.set()
+                while not self._stopping.is_set():
+                    for payload in _notifications(connection.connection, timeout=1.0):
+                        self.deliver_local(json.loads(payload))
+            except Exception:
+                logger.exception("Order event listener lost its connection; reconnecting")
+                self._listening.clear()
+                connection.close()
+                self._stopping.wait(self.RECONNECT_SECONDS)
+        connection.close()
+
+    def close(self):
+        """Stop the listener thread and close its connection."""
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'ORDER_EVENTS_BROKER', 'cashier.events.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the process-wide broker (tests, custom deployments)."""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def build_order_event(order, event_type):
+    return {
+        'type': event_type,
+        'order_id': order.order_id,
+        'status': order.status,
+        'table_number': order.table_number,
+        'waiter_id': order.waiter_id,
+        'total_amount': str(order.total_amount),
+        'refunded_amount': str(order.refunded_amount or 0),
+        'at': timezone.now().isoformat(),
+    }
+
+
+def publish_order_event(order, event_type):
+    """Publish once the surrounding transaction commits (immediately in autocommit)."""
+    event = build_order_event(order, event_type)
+    transaction.on_commit(lambda: get_broker().publish(event))
@@ -0,0 +1,250 @@
+# backend/kot_project/cashier/exports.py
+import csv
+import gzip
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .filters import filter_orders
+from .models import ExportJob, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 1000
+
+# format -> (file suffix, content type of the stored file)
+EXPORT_FILE_TYPES = {
+    'csv': ('csv.gz', 'application/gzip'),
+    'ndjson': ('ndjson.gz', 'application/gzip'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+CSV_HEADER = [
+    'Order ID', 'Table', 'Items', 'Total (₹)', 'Received (₹)', 'Balance (₹)',
+    'Payment Mode', 'Status', 'Waiter', 'Created At', 'Paid At'
+]
+
+
+def iter_orders_with_items(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield (order, items) pairs with flat memory use.
+
+    Orders come from a server-side cursor (QuerySet.iterator on PostgreSQL);
+    the items for each chunk of orders are loaded with one extra query.
+    """
+    orders = queryset.prefetch_related(None).select_related('waiter').iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(orders, chunk_size))
+        if not chunk:
+            return
+        items = defaultdict(list)
+        for item in OrderItem.objects.filter(order_id__in=[order.order_id for order in chunk]).order_by('id'):
+            items[item.order_id].append(item)
+        for order in chunk:
+            yield order, items[order.order_id]
+
+
+def csv_row(order, items):
+    items_str = '; '.join(f"{item.quantity}x {item.name} @ ₹{item.price}" for item in items)
+    return [
+        order.order_id,
+        order.table_number or '',
+        items_str,
+        str(order.total_amount or 0),
+        str(order.received_amount or 0),
+        str(order.balance_amount or 0),
+        (order.payment_mode or '').capitalize(),
+        (order.status or '').capitalize(),
+        order.waiter.username if order.waiter else 'No Waiter',
+        order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        order.paid_at.strftime('%Y-%m-%d %H:%M:%S') if order.paid_at else '-',
+    ]
+
+
+def order_record(order, items):
+    """Order as a JSON-ready dict, same shape as the order history list."""
+    return {
+        "order_id": order.order_id,
+        "table_number": order.table_number,
+        "total_amount": str(order.total_amount),
+        "received_amount": str(order.received_amount),
+        "balance_amount": str(order.balance_amount),
+        "payment_mode": order.payment_mode,
+        "status": order.status,
+        "created_at": order.created_at.isoformat(),
+        "paid_at": order.paid_at.isoformat() if order.paid_at else None,
+        "waiter": order.waiter.username if order.waiter else None,
+        "items": [
+            {
+                "name": item.name,
+                "quantity": item.quantity,
+                "price": str(item.price),
+                "subtotal": str(item.subtotal()),
+            }
+            for item in items
+        ],
+    }
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator of CSV lines for a StreamingHttpResponse."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order, items in iter_orders_with_items(queryset, chunk_size):
+        yield writer.writerow(csv_row(order, items))
+
+
+# ──────────────────────────────────────────────────────────────
+# Background export jobs
+# ──────────────────────────────────────────────────────────────
+
+def export_root():
+    return Path(settings.EXPORT_ROOT)
+
+
+def export_path(job):
+    return export_root() / job.file_name
+
+
+def _write_csv(path, rows):
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(CSV_HEADER)
+        for order, items in rows:
+            writer.writerow(csv_row(order, items))
+
+
+def _write_ndjson(path, rows):
+    with gzip.open(path, 'wt', encoding='utf-8') as fh:
+        for order, items in rows:
+            fh.write(json.dumps(order_record(order, items), ensure_ascii=False))
+            fh.write('\n')
+
+
+def _write_xlsx(path, rows):
+    # Optional dependency; only needed for XLSX jobs. The file is a zip already.
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Orders')
+    sheet.append(CSV_HEADER)
+    for order, items in rows:
+        row = csv_row(order, items)
+        row[3:6] = [order.total_amount or 0, order.received_amount or 0, order.balance_amount or 0]
+        sheet.append(row)
+    workbook.save(path)
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'ndjson': _write_ndjson,
+    'xlsx': _write_xlsx,
+}
+
+
+class ClaimLost(Exception):
+    """The job was re-claimed by another worker after this one went quiet."""
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running; SKIP LOCKED lets workers run side
+    by side. A running job whose claim is older than EXPORT_CLAIM_TIMEOUT_SECONDS
+    belongs to a worker that died and is claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EXPORT_CLAIM_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='queued') | Q(status='running', claimed_at__lt=stale))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == 'running':
+            logger.warning("Re-claiming export job %s, last claimed %s", job.pk, job.claimed_at)
+        job.status = 'running'
+        job.started_at = now
+        job.claimed_at = now
+        job.processed_rows = 0
+        job.save(update_fields=['status', 'started_at', 'claimed_at', 'processed_rows'])
+    return job
+
+
+def _renew_claim(job, **fields):
+    """Record progress and refresh the claim; raises ClaimLost if another worker took the job."""
+    now = timezone.now()
+    if not ExportJob.objects.filter(pk=job.pk, claimed_at=job.claimed_at).update(claimed_at=now, **fields):
+        raise ClaimLost(job.pk)
+    job.claimed_at = now
+
+
+def _track_progress(job, rows):
+    processed = 0
+    for row in rows:
+        yield row
+        processed += 1
+        if processed % EXPORT_CHUNK_SIZE == 0:
+            _renew_claim(job, processed_rows=processed)
+    job.processed_rows = processed
+
+
+def run_export_job(job):
+    """Write the export for a claimed job, recording progress, result or error."""
+    qs = filter_orders(Order.objects.order_by('-created_at', '-order_id'), job.filters)
+    job.total_rows = qs.count()
+    suffix, _ = EXPORT_FILE_TYPES[job.format]
+    path = export_root() / f"{job.pk}.{suffix}"
+    # Per claim, so a re-claiming worker never writes into this one's file
+    partial = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+    try:
+        _renew_claim(job, total_rows=job.total_rows)
+        export_root().mkdir(parents=True, exist_ok=True)
+        WRITERS[job.format](partial, _track_progress(job, iter_orders_with_items(qs)))
+        _renew_claim(job)
+        os.replace(partial, path)
+    except ClaimLost:
+        logger.warning("Export job %s was re-claimed by another worker; abandoning", job.pk)
+        partial.unlink(missing_ok=True)
+        return job
+    except Exception as e:
+        logger.exception("Export job %s failed", job.pk)
+        partial.unlink(missing_ok=True)
+        job.status = 'failed'
+        job.error = str(e)
+        job.file_name = ''
+    else:
+        job.status = 'done'
+        job.file_name = path.name
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file_name', 'processed_rows', 'finished_at'])
+    return job
+
+
+def purge_expired_exports():
+    """Delete finished jobs (and their files) older than EXPORT_FILE_TTL_SECONDS."""
+    cutoff = timezone.now() - timedelta(seconds=settings.EXPORT_FILE_TTL_SECONDS)
+    expired = ExportJob.objects.filter(status__in=('done', 'failed'), finished_at__lt=cutoff)
+    for job in expired.iterator():
+        if job.file_name:
+            export_path(job).unlink(missing_ok=True)
+    return expired.delete()[0]
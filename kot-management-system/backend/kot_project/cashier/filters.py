@@ -0,0 +1,58 @@
+# backend/kot_project/cashier/filters.py
+from datetime import datetime, timedelta
+
+from .business_day import current_business_day, in_business_days
+from .search import search_orders
+
+# Query parameters understood by filter_orders (order history list, CSV, export jobs)
+ORDER_FILTER_PARAMS = (
+    'table_number', 'status', 'payment_mode', 'date_from', 'date_to',
+    'search', 'today', 'yesterday',
+)
+
+
+def filter_orders(qs, params):
+    """Apply order history filters from a mapping (query params or a stored job)."""
+    table_number = params.get('table_number')
+    status = params.get('status')
+    payment_mode = params.get('payment_mode')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    search = (params.get('search') or '').strip()
+    today = params.get('today')
+    yesterday = params.get('yesterday')
+
+    if table_number:
+        try:
+            qs = qs.filter(table_number=int(table_number))
+        except ValueError:
+            pass
+    if status:
+        qs = qs.filter(status=status)
+    if payment_mode:
+        qs = qs.filter(payment_mode=payment_mode)
+    # Business days become [start, end) ranges on created_at (index range scan)
+    if date_from:
+        try:
+            from_dt = datetime.strptime(date_from, "%Y-%m-%d").date()
+            qs = in_business_days(qs, 'created_at', first=from_dt)
+        except ValueError:
+            pass
+    if date_to:
+        try:
+            to_dt = datetime.strptime(date_to, "%Y-%m-%d").date()
+            qs = in_business_days(qs, 'created_at', last=to_dt)
+        except ValueError:
+            pass
+    if search:
+        # Id prefix via PK ranges, item names via trigram index; ranked
+        qs = search_orders(qs, search).order_by('-search_rank', '-created_at', '-order_id')
+
+    if today == '1':
+        day = current_business_day()
+        qs = in_business_days(qs, 'created_at', day, day)
+    elif yesterday == '1':
+        day = current_business_day() - timedelta(days=1)
+        qs = in_business_days(qs, 'created_at', day, day)
+
+    return qs
@@ -0,0 +1,83 @@
+# backend/kot_project/cashier/forecast.py
+"""
+Next-day demand per menu item.
+
+Hourly item sales for the target's weekday are loaded from the
+ItemSalesHourly rollup into one (items, weeks, 24) array. The forecast is,
+per item and hour, an exponentially weighted mean of the same weekday and
+hour over the preceding weeks - the whole menu in a few array operations.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .business_day import current_business_day, cutoff_hour
+from .models import ItemSalesHourly
+
+
+def load_hourly_sales(days):
+    """
+    Quantities sold per item on the given business days. Returns
+    (food_ids, names, sales) where sales[i, d, s] is item i on days[d] in
+    slot s; slot 0 is the business day's cutoff hour.
+    """
+    position = {day: index for index, day in enumerate(days)}
+    rows = list(
+        ItemSalesHourly.objects.filter(business_day__in=days)
+        .order_by('business_day')
+        .values_list('food_id', 'business_day', 'hour', 'quantity', 'name')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), {}, np.zeros((0, len(days), 24))
+
+    food_col, day_col, hour_col, quantity_col, _ = zip(*rows)
+    food_ids, item_index = np.unique(np.array(food_col, dtype=np.int64), return_inverse=True)
+    day_index = np.fromiter((position[day] for day in day_col), dtype=np.int64, count=len(rows))
+    slot = (np.array(hour_col, dtype=np.int64) - cutoff_hour()) % 24
+
+    sales = np.zeros((len(food_ids), len(days), 24))
+    np.add.at(sales, (item_index, day_index, slot), np.array(quantity_col, dtype=np.float64))
+    # Rows are in day order, so the last name seen per item is the newest
+    names = {food_id: name for food_id, _, _, _, name in rows}
+    return food_ids, names, sales
+
+
+def forecast_demand(target=None, weeks=None, decay=None):
+    """
+    Expected quantity per item and hour for business day `target`
+    (default tomorrow), from the same weekday over the last `weeks` weeks.
+    Each older week counts `1 - decay` times the next; weeks before an item
+    was first sold on that weekday are ignored. Highest demand first.
+    """
+    target = target or current_business_day() + timedelta(days=1)
+    weeks = weeks or settings.FORECAST_HISTORY_WEEKS
+    decay = settings.FORECAST_DECAY if decay is None else decay
+
+    # Only the target's weekday is needed: oldest week first
+    days = [target - timedelta(weeks=weeks - week) for week in range(weeks)]
+    food_ids, names, same_weekday = load_hourly_sales(days)
+    if not len(food_ids):
+        return []
+
+    age = np.arange(weeks)[::-1]                       # 0 = one week before target
+    first_sale = np.argmax(same_weekday.sum(axis=2) > 0, axis=1)
+    active = np.arange(weeks)[None, :] >= first_sale[:, None]
+    weights = active * (1 - decay) ** age[None, :]
+    weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+
+    by_slot = np.clip(np.einsum('iw,iwh->ih', weights, same_weekday), 0, None)
+    by_hour = np.roll(by_slot, cutoff_hour(), axis=1)  # index = wall-clock hour
+    expected = by_hour.sum(axis=1)
+
+    forecast = []
+    for index in np.argsort(-expected, kind='stable'):
+        food_id = int(food_ids[index])
+        forecast.append({
+            "food_id": food_id,
+            "name": names[food_id],
+            "expected_quantity": round(float(expected[index]), 1),
+            "peak_hour": int(np.argmax(by_hour[index])),
+            "hourly": [round(float(quantity), 2) for quantity in by_hour[index]],
+        })
+    return forecast
@@ -0,0 +1,91 @@
+# backend/kot_project/cashier/idempotency.py
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def purge_expired_keys():
+    """Delete stored responses past their TTL. Returns the number removed."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def idempotent(view_method):
+    """
+    Make a viewset action safe to retry with an Idempotency-Key header.
+
+    The key is claimed, the action run and its response (anything below 500)
+    stored in one transaction, for IDEMPOTENCY_KEY_TTL_SECONDS. A crash,
+    exception or server error rolls all three back, so no key is ever left
+    half-claimed. A concurrent duplicate waits on the key's unique index
+    until the first request finishes, then replays its response (or runs
+    itself if the first rolled back). Retries with the same key get the
+    stored response back without running the action again. Requests
+    without the header behave exactly as before.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        now = timezone.now()
+        scope = f"{view_method.__name__}:{kwargs.get('pk') or ''}"
+        request_hash = _request_hash(request)
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60)
+
+        with transaction.atomic():
+            # An expired key is free to be reused
+            IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+            record, created = IdempotencyKey.objects.get_or_create(
+                key=key,
+                defaults={
+                    'scope': scope,
+                    'request_hash': request_hash,
+                    'expires_at': now + timedelta(seconds=ttl),
+                }
+            )
+
+            if not created:
+                if record.scope != scope or record.request_hash != request_hash:
+                    return Response(
+                        {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                response = Response(record.response_body, status=record.response_status)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Server errors are not final; let the client retry for real
+                transaction.set_rollback(True)
+            else:
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    return wrapper
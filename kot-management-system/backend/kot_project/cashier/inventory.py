@@ -0,0 +1,103 @@
+# backend/kot_project/cashier/inventory.py
+"""
+Portion counts for menu items (FoodItem.portions_left; NULL = not counted).
+
+Orders take portions with one guarded UPDATE for the whole cart - a row is
+only decremented while it still has enough left, which Postgres re-checks
+against the latest row version when two waiters race for the same item -
+and give them back with one UPDATE when cancelled. The only row locks are
+that UPDATE's, held until the order's short transaction commits. An item
+reaching zero goes out of stock and comes back in stock when portions are
+returned.
+"""
+from collections import Counter
+
+from django.db import connection
+from django.utils import timezone
+
+from management.menu_cache import bump_menu_version_on_commit
+from management.models import FoodItem
+
+from .models import OrderItem
+
+
+class SoldOut(Exception):
+    """Raised by take_portions; `items` are the FoodItems without enough portions left."""
+
+    def __init__(self, items):
+        super().__init__(", ".join(food.food_name for food in items))
+        self.items = items
+
+
+def _take_sql():
+    table = connection.ops.quote_name(FoodItem._meta.db_table)
+    return f"""
+        WITH wanted AS (
+            SELECT * FROM unnest(%(ids)s::integer[], %(quantities)s::integer[]) AS w(food_id, quantity)
+        )
+        UPDATE {table} AS f
+        SET portions_left = f.portions_left - wanted.quantity,
+            stock_status = CASE WHEN f.portions_left = wanted.quantity THEN 'out_of_stock' ELSE f.stock_status END,
+            last_stock_update = CASE WHEN f.portions_left = wanted.quantity THEN %(now)s ELSE f.last_stock_update END
+        FROM wanted
+        WHERE f.food_id = wanted.food_id AND f.portions_left >= wanted.quantity
+        RETURNING f.food_id, f.portions_left
+    """
+
+
+def _restore_sql():
+    table = connection.ops.quote_name(FoodItem._meta.db_table)
+    items = connection.ops.quote_name(OrderItem._meta.db_table)
+    return f"""
+        WITH sold AS (
+            SELECT food_id, SUM(quantity) AS quantity FROM {items}
+            WHERE order_id = ANY(%(order_ids)s) AND food_id IS NOT NULL
+            GROUP BY food_id
+        )
+        UPDATE {table} AS f
+        SET portions_left = f.portions_left + sold.quantity,
+            stock_status = CASE WHEN f.portions_left = 0 THEN 'in_stock' ELSE f.stock_status END,
+            last_stock_update = CASE WHEN f.portions_left = 0 THEN %(now)s ELSE f.last_stock_update END
+        FROM sold
+        WHERE f.food_id = sold.food_id AND f.portions_left IS NOT NULL
+        RETURNING f.food_id, f.portions_left - sold.quantity
+    """
+
+
+def take_portions(lines):
+    """
+    Decrement portions for validated cart lines ({"food", "quantity"}) in
+    one statement. Raises SoldOut if any counted item did not have enough
+    left - call inside the order's transaction so it rolls back.
+    """
+    wanted = Counter()
+    for line in lines:
+        if line['food'].portions_left is not None:
+            wanted[line['food'].food_id] += line['quantity']
+    if not wanted:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(_take_sql(), {
+            'ids': list(wanted),
+            'quantities': list(wanted.values()),
+            'now': timezone.now(),
+        })
+        taken = dict(cursor.fetchall())
+
+    short = {food_id for food_id in wanted if food_id not in taken}
+    if short:
+        raise SoldOut([line['food'] for line in lines if line['food'].food_id in short])
+    if any(portions == 0 for portions in taken.values()):
+        bump_menu_version_on_commit()
+
+
+def restore_portions(order_ids):
+    """Give back the portions of cancelled orders' counted items."""
+    if not order_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_restore_sql(), {'order_ids': list(order_ids), 'now': timezone.now()})
+        restored = cursor.fetchall()
+    if any(previous == 0 for _, previous in restored):
+        bump_menu_version_on_commit()
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cashier.forecast import forecast_demand
+
+
+class Command(BaseCommand):
+    help = "Print the expected quantity per menu item for a business day (default tomorrow)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Business day to forecast, YYYY-MM-DD")
+        parser.add_argument('--weeks', type=int, help="Weeks of history to use")
+        parser.add_argument('--top', type=int, default=0, help="Only show the N busiest items")
+
+    def handle(self, *args, **options):
+        try:
+            target = datetime.strptime(options['date'], "%Y-%m-%d").date() if options['date'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        forecast = forecast_demand(target, weeks=options['weeks'])
+        if options['top']:
+            forecast = forecast[:options['top']]
+        for row in forecast:
+            self.stdout.write(
+                f"{row['food_id']:>6}  {row['name'][:40]:<40}  {row['expected_quantity']:>8.1f}  peak {row['peak_hour']:02d}:00"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Forecast {len(forecast)} items"))
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cashier.rollups import rebuild_daily_collection
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailyCollection rollup from cashier orders (backfill / repair)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First business day, YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to', help="Last business day, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = self.parse_day(options['date_from'])
+            date_to = self.parse_day(options['date_to'])
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        written = rebuild_daily_collection(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily collection rows"))
+
+    @staticmethod
+    def parse_day(value):
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cashier.exports import claim_next_job, purge_expired_exports, run_export_job
+
+
+class Command(BaseCommand):
+    help = "Process queued order history export jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit")
+
+    def handle(self, *args, **options):
+        purge_expired_exports()
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(settings.EXPORT_WORKER_POLL_SECONDS)
+                    # Drop connections the server timed out while we were idle
+                    close_old_connections()
+                    continue
+                job = run_export_job(job)
+                style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+                self.stdout.write(style(f"Export {job.pk}: {job.status} ({job.processed_rows} rows)"))
+        except KeyboardInterrupt:
+            self.stdout.write("Export worker stopped")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0011_order_selected_seats_order_table_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-order_id'], name='order_created_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows: last known change is the refund, payment or creation time
+    Order = apps.get_model('cashier', 'Order')
+    Order.objects.update(updated_at=Coalesce('refunded_at', 'paid_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0012_order_created_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:41
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_category(apps, schema_editor):
+    OrderItem = apps.get_model('cashier', 'OrderItem')
+    FoodItem = apps.get_model('management', 'FoodItem')
+    OrderItem.objects.filter(food_id__isnull=False).update(
+        category=Subquery(
+            FoodItem.objects.filter(food_id=OuterRef('food_id')).values('category')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0013_order_updated_at'),
+        ('management', '0010_merge_20251120_1002'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(backfill_category, migrations.RunPython.noop),
+    ]
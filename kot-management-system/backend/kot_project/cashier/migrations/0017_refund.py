@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:32
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_ledger(apps, schema_editor):
+    # One ledger entry per already-refunded order, carrying its running total
+    Order = apps.get_model('cashier', 'Order')
+    Refund = apps.get_model('cashier', 'Refund')
+    refunded = Order.objects.filter(refunded_amount__gt=0).only(
+        'order_id', 'refunded_amount', 'refund_reason', 'refunded_at', 'paid_at', 'created_at'
+    )
+    Refund.objects.bulk_create(
+        [
+            Refund(
+                order_id=order.order_id,
+                amount=order.refunded_amount,
+                reason=order.refund_reason,
+                created_at=order.refunded_at or order.paid_at or order.created_at,
+            )
+            for order in refunded.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0016_dailycollection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Refund',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refunds', to='cashier.order')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(seed_ledger, migrations.RunPython.noop),
+    ]
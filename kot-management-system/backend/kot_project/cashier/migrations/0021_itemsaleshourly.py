@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0020_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSalesHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField(help_text='Local wall-clock hour, 0-23')),
+                ('food_id', models.IntegerField()),
+                ('name', models.CharField(max_length=200)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-business_day', 'hour'],
+                'indexes': [models.Index(fields=['food_id', 'business_day'], name='itemsales_food_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('business_day', 'hour', 'food_id'), name='unique_item_sales_hourly')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:19
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_claims(apps, schema_editor):
+    # Jobs already running were claimed when they started
+    ExportJob = apps.get_model('cashier', 'ExportJob')
+    ExportJob.objects.filter(status='running').update(claimed_at=Coalesce(F('started_at'), F('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0022_deletedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_claims, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:31
+
+from django.db import migrations
+
+
+def purge_unfinished(apps, schema_editor):
+    # Keys claimed in autocommit whose request crashed before storing a
+    # response; claims are transactional now, so none can appear again
+    IdempotencyKey = apps.get_model('cashier', 'IdempotencyKey')
+    IdempotencyKey.objects.filter(response_status__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0023_exportjob_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(purge_unfinished, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
 # cashier/models.py
-from django.db import models
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from management.models import AdminUser
@@ -37,6 +42,9 @@ class Order(models.Model):
     payment_mode = models.CharField(max_length=10, choices=PAYMENT_MODE_CHOICES, default='cash')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every write; drives the ?since= delta feed and ETags.
+    # Queryset .update() calls must set it explicitly.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     paid_at = models.DateTimeField(null=True, blank=True)
 
     # Refund fields
@@ -49,8 +57,25 @@ class Order(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['table_number']),
-            models.Index(fields=['status']),
             models.Index(fields=['paid_at']),
+            # Keyset pagination on (created_at, order_id)
+            models.Index(fields=['-created_at', '-order_id'], name='order_created_keyset_idx'),
+            # Status-filtered lists, newest first (replaces the plain status index)
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            # Pending queue: small partial index, stays hot as history grows
+            models.Index(
+                fields=['-created_at', '-order_id'],
+                name='order_pending_created_idx',
+                condition=models.Q(status='pending'),
+            ),
+            # Waiter history over a date range
+            models.Index(fields=['waiter', '-created_at'], name='order_waiter_created_idx'),
+            # Collection by payment mode over a paid_at range
+            models.Index(
+                fields=['payment_mode', 'paid_at'],
+                name='order_paid_mode_idx',
+                condition=models.Q(status='paid'),
+            ),
         ]
 
     def save(self, *args, **kwargs):
@@ -71,6 +96,14 @@ class Order(models.Model):
 
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        # Tombstone for the ?since= feed; queryset .delete() calls must record it too
+        order_id = self.order_id
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            DeletedOrder.objects.update_or_create(order_id=order_id, defaults={'deleted_at': timezone.now()})
+        return result
+
     def __str__(self):
         seats_info = f" - Seats: {', '.join(self.selected_seats)}" if self.selected_seats else ""
         return f"Order #{self.order_id} - Table {self.table_number}{seats_info}"
@@ -82,8 +115,177 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     food_id = models.IntegerField(null=True, blank=True)
+    # Snapshot of FoodItem.category taken when the order is placed
+    category = models.CharField(max_length=10, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Item analytics by menu item
+            models.Index(fields=['food_id', 'order'], name='orderitem_food_idx'),
+            # Order history search: name__icontains compiles to UPPER(name) LIKE ...
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='orderitem_name_trgm_idx'),
+        ]
+
     def subtotal(self):
         return self.quantity * self.price
 
     def __str__(self):
-        return f"{self.quantity}× {self.name}"
\ No newline at end of file
+        return f"{self.quantity}× {self.name}"
+
+class DeletedOrder(models.Model):
+    """Ids of deleted orders, sent to ?since= feed clients as tombstones."""
+    order_id = models.IntegerField(primary_key=True)
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+class Refund(models.Model):
+    """
+    Append-only ledger of refunds. Order.refunded_amount is the cached
+    running total and is only ever bumped together with a new row here.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='refunds')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    reason = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Refund entries are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Refund ₹{self.amount} on order #{self.order_id}"
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a request sent with an Idempotency-Key header.
+    A retry with the same key replays the response instead of re-running it.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    scope = models.CharField(max_length=100, help_text="Action name and target, e.g. mark_paid:42")
+    request_hash = models.CharField(max_length=64)
+    # NULL only between the claim and the stored response, inside the claiming
+    # transaction - other requests never see it (see idempotency.idempotent)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.scope})"
+
+
+class DailyCollection(models.Model):
+    """
+    Per business day and payment mode running totals, kept in step with
+    mark_paid / cancel_order / refund so the collection summary is a lookup.
+    Rebuild with `manage.py rebuild_daily_collection`.
+    """
+    business_day = models.DateField()
+    payment_mode = models.CharField(max_length=10, choices=Order.PAYMENT_MODE_CHOICES)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-business_day', 'payment_mode']
+        constraints = [
+            models.UniqueConstraint(fields=['business_day', 'payment_mode'], name='unique_daily_collection'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_day} {self.payment_mode}: ₹{self.total_amount}"
+
+
+class ItemSalesHourly(models.Model):
+    """
+    Quantity, revenue and refunds per menu item, business day and local hour,
+    kept in step with mark_paid / cancel_order / refund like DailyCollection.
+    Order-level refunds are split across items by subtotal. Items without a
+    food_id are not tracked. Rebuild with `manage.py rebuild_item_sales`.
+    """
+    business_day = models.DateField()
+    hour = models.PositiveSmallIntegerField(help_text="Local wall-clock hour, 0-23")
+    food_id = models.IntegerField()
+    name = models.CharField(max_length=200)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refunded_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-business_day', 'hour']
+        constraints = [
+            models.UniqueConstraint(fields=['business_day', 'hour', 'food_id'], name='unique_item_sales_hourly'),
+        ]
+        indexes = [
+            # Per-item trend over a date range
+            models.Index(fields=['food_id', 'business_day'], name='itemsales_food_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_day} {self.hour:02d}h {self.name}: {self.quantity}"
+
+
+class ExportJob(models.Model):
+    """
+    Order history export run by `manage.py run_export_worker`. Filters are
+    the order history query params; the finished file lives under EXPORT_ROOT.
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+        ('xlsx', 'XLSX'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    requested_by = models.ForeignKey(
+        AdminUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs'
+    )
+    total_rows = models.IntegerField(null=True, blank=True)
+    processed_rows = models.IntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True, help_text="Relative to EXPORT_ROOT")
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Set when a worker claims the job and on every progress update
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker picks the oldest queued (or stale running) job
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'),
+        ]
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
+
+    def __str__(self):
+        return f"Export {self.id} ({self.format}, {self.status})"
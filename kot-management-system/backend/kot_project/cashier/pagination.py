@@ -0,0 +1,123 @@
+# backend/kot_project/cashier/pagination.py
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrderKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for orders, keyed on (created_at, order_id),
+    or on (search_rank, created_at, order_id) for ranked search results.
+
+    Each page is a range scan starting right after the last row of the
+    previous page, so page N costs the same as page 1.
+
+    Pagination is opt-in: clients that send neither ?cursor= nor ?page_size=
+    keep getting the plain list they got before.
+    """
+    ordering = ('-created_at', '-order_id')
+    rank_field = 'search_rank'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'ORDER_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'ORDER_MAX_PAGE_SIZE', 500)
+        self.next_position = None
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if not value:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        # Search results carry a relevance rank that leads the key
+        ranked = self.rank_field in queryset.query.annotations
+        ordering = (f'-{self.rank_field}',) + self.ordering if ranked else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor, ranked), ranked))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        if len(rows) > page_size:
+            last = page[-1]
+            rank = (getattr(last, self.rank_field),) if ranked else ()
+            self.next_position = rank + (last.created_at, last.order_id)
+        else:
+            self.next_position = None
+        return page
+
+    def after(self, position, ranked):
+        """Rows strictly after `position` in the (rank,) created_at, order_id order."""
+        created_at, order_id = position[-2:]
+        condition = Q(created_at__lt=created_at) | Q(created_at=created_at, order_id__lt=order_id)
+        if ranked:
+            rank = position[0]
+            condition = Q(**{f'{self.rank_field}__lt': rank}) | (Q(**{self.rank_field: rank}) & condition)
+        return condition
+
+    def encode_cursor(self, position):
+        *rank, created_at, order_id = position
+        raw = '|'.join([str(value) for value in rank] + [created_at.isoformat(), str(order_id)])
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor, ranked=False):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+            parts = raw.split('|')
+            if len(parts) != (3 if ranked else 2):
+                raise ValueError(raw)
+            rank = (int(parts[0]),) if ranked else ()
+            return rank + (datetime.fromisoformat(parts[-2]), int(parts[-1]))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
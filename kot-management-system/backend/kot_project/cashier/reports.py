@@ -0,0 +1,227 @@
+# backend/kot_project/cashier/reports.py
+import hashlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import Trunc
+
+from .business_day import (
+    business_day_range, business_timezone, current_business_day, cutoff_hour, in_business_days,
+)
+from .models import ItemSalesHourly, Order
+
+BUCKETS = ('hour', 'day', 'week', 'month')
+
+# Range used when date_from is not given, in business days before date_to
+DEFAULT_SPAN_DAYS = {
+    'hour': 0,
+    'day': 29,
+    'week': 7 * 12 - 1,
+    'month': 365,
+}
+
+
+# Longest range one request may cover, in business days. Every bucket in
+# the range is returned (zero-filled), so this bounds the response size.
+MAX_SPAN_DAYS = {
+    'hour': 92,
+    'hour_of_day': 731,
+    'day': 731,
+    'week': 731,
+    'month': 3653,
+}
+
+
+class SpanTooLong(ValueError):
+    """The requested date range is longer than MAX_SPAN_DAYS allows for its bucket."""
+
+
+def check_span(bucket, first, last):
+    limit = MAX_SPAN_DAYS[bucket]
+    if (last - first).days + 1 > limit:
+        raise SpanTooLong(f"{bucket} reports cover at most {limit} days; narrow date_from / date_to")
+
+
+def _bucket_expression(bucket):
+    """
+    Bucket start in the business time zone. Day and coarser buckets follow
+    the business day (shifted by the cutoff hour); hours are wall-clock.
+    """
+    field = F('created_at')
+    if bucket != 'hour':
+        field = ExpressionWrapper(field - timedelta(hours=cutoff_hour()), output_field=DateTimeField())
+    return Trunc(field, bucket, output_field=DateTimeField(), tzinfo=business_timezone())
+
+
+def _bucket_keys(bucket, first, last):
+    """Every bucket start in the range, so empty periods are reported as zero."""
+    tz = business_timezone()
+    if bucket == 'hour':
+        start, end = business_day_range(first, last)
+        moment = start.replace(minute=0, second=0, microsecond=0)
+        while moment < end:
+            yield moment.astimezone(tz).replace(minute=0, second=0, microsecond=0)
+            moment += timedelta(hours=1)
+        return
+
+    if bucket == 'week':
+        day = first - timedelta(days=first.weekday())
+    elif bucket == 'month':
+        day = first.replace(day=1)
+    else:
+        day = first
+    while day <= last:
+        yield day
+        if bucket == 'day':
+            day += timedelta(days=1)
+        elif bucket == 'week':
+            day += timedelta(days=7)
+        else:
+            day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _empty_row():
+    return {"revenue": Decimal('0'), "order_count": 0, "refunded": Decimal('0')}
+
+
+def sales_timeseries(bucket, first, last, payment_mode=None, waiter_id=None, status='paid'):
+    """
+    Revenue, order count, average ticket and refunds per bucket for orders
+    created in business days first..last, in one GROUP BY over Order.
+    `status=None` counts every order regardless of status.
+    """
+    qs = in_business_days(Order.objects.all(), 'created_at', first, last)
+    if status:
+        qs = qs.filter(status=status)
+    if payment_mode:
+        qs = qs.filter(payment_mode=payment_mode)
+    if waiter_id is not None:
+        qs = qs.filter(waiter_id=waiter_id)
+
+    aggregated = (
+        qs.annotate(bucket=_bucket_expression(bucket))
+        .values('bucket')
+        .annotate(revenue=Sum('total_amount'), order_count=Count('order_id'), refunded=Sum('refunded_amount'))
+        .order_by('bucket')
+    )
+    rows = {}
+    for entry in aggregated:
+        key = entry['bucket'] if bucket == 'hour' else entry['bucket'].date()
+        rows[key] = entry
+
+    series = []
+    totals = _empty_row()
+    for key in _bucket_keys(bucket, first, last):
+        row = rows.get(key) or _empty_row()
+        revenue, count, refunded = row['revenue'] or Decimal('0'), row['order_count'], row['refunded'] or Decimal('0')
+        totals['revenue'] += revenue
+        totals['order_count'] += count
+        totals['refunded'] += refunded
+        series.append({
+            "bucket": key.isoformat(),
+            "revenue": float(revenue),
+            "order_count": count,
+            "average_ticket": round(float(revenue) / count, 2) if count else 0.0,
+            "refunded": float(refunded),
+        })
+
+    return {
+        "bucket": bucket,
+        "date_from": first.isoformat(),
+        "date_to": last.isoformat(),
+        "series": series,
+        "totals": {
+            "revenue": float(totals['revenue']),
+            "order_count": totals['order_count'],
+            "average_ticket": round(float(totals['revenue']) / totals['order_count'], 2) if totals['order_count'] else 0.0,
+            "refunded": float(totals['refunded']),
+        },
+    }
+
+
+def default_range(bucket, first=None, last=None):
+    last = last or current_business_day()
+    first = first or last - timedelta(days=DEFAULT_SPAN_DAYS[bucket])
+    return first, last
+
+
+def cached_sales_timeseries(bucket, first, last, **filters):
+    """
+    sales_timeseries, cached for SALES_REPORT_CACHE_SECONDS once the range
+    is closed (ends before the current business day). Late refunds on a
+    closed day show up when the entry expires.
+    """
+    if last >= current_business_day():
+        return sales_timeseries(bucket, first, last, **filters)
+
+    raw = f"{bucket}|{first}|{last}|{sorted(filters.items())}"
+    key = "sales_timeseries:" + hashlib.md5(raw.encode()).hexdigest()
+    result = cache.get(key)
+    if result is None:
+        result = sales_timeseries(bucket, first, last, **filters)
+        cache.set(key, result, settings.SALES_REPORT_CACHE_SECONDS)
+    return result
+
+
+# ──────────────────────────────────────────────────────────────
+# Item analytics (ItemSalesHourly rollup)
+# ──────────────────────────────────────────────────────────────
+TOP_ITEMS_ORDERING = ('quantity', 'revenue')
+TREND_BUCKETS = ('day', 'hour', 'hour_of_day')
+
+
+def _item_figures(entry):
+    return {
+        "quantity": entry['sold'],
+        "revenue": float(entry['total']),
+        "refunded": float(entry['refunded']),
+    }
+
+
+def _item_totals():
+    return {'sold': Sum('quantity'), 'total': Sum('revenue'), 'refunded': Sum('refunded_amount')}
+
+
+def top_items(first, last, limit=10, by='quantity'):
+    """Best sellers over business days first..last, by quantity or revenue."""
+    ranked = (
+        ItemSalesHourly.objects.filter(business_day__gte=first, business_day__lte=last)
+        .values('food_id')
+        .annotate(item_name=Max('name'), **_item_totals())
+        .order_by('-sold' if by == 'quantity' else '-total', 'food_id')[:limit]
+    )
+    return [{"food_id": entry['food_id'], "name": entry['item_name'], **_item_figures(entry)} for entry in ranked]
+
+
+def item_trend(food_id, first, last, bucket='day'):
+    """
+    Sales of one item over business days first..last: per day, per (day, hour),
+    or as an hour-of-day profile summed over the range. Empty slots are zero.
+    """
+    rows = ItemSalesHourly.objects.filter(food_id=food_id, business_day__gte=first, business_day__lte=last)
+    group = {'day': ('business_day',), 'hour': ('business_day', 'hour'), 'hour_of_day': ('hour',)}[bucket]
+    found = {
+        tuple(entry[field] for field in group): entry
+        for entry in rows.values(*group).annotate(**_item_totals()).order_by()
+    }
+
+    days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+    if bucket == 'day':
+        keys = [(day,) for day in days]
+    elif bucket == 'hour':
+        # Business day D runs from the cutoff hour on D to the cutoff hour on D+1
+        hours = [(cutoff_hour() + offset) % 24 for offset in range(24)]
+        keys = [(day, hour) for day in days for hour in hours]
+    else:
+        keys = [(hour,) for hour in range(24)]
+
+    empty = {'sold': 0, 'total': Decimal('0'), 'refunded': Decimal('0')}
+    series = []
+    for key in keys:
+        point = {field: value.isoformat() if hasattr(value, 'isoformat') else value for field, value in zip(group, key)}
+        point.update(_item_figures(found.get(key, empty)))
+        series.append(point)
+    return series
@@ -0,0 +1,244 @@
+# backend/kot_project/cashier/rollups.py
+from collections import defaultdict
+from decimal import Decimal
+
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .business_day import business_day_for, business_timezone, cutoff_hour, in_business_days
+from .models import DailyCollection, ItemSalesHourly, Order, OrderItem, Refund
+
+CENT = Decimal('0.01')
+
+
+def business_day_of(field):
+    """SQL expression for the business day of a timestamp column."""
+    shifted = ExpressionWrapper(F(field) - timedelta(hours=cutoff_hour()), output_field=DateTimeField())
+    return TruncDate(shifted, tzinfo=business_timezone())
+
+
+def _bump(business_day, payment_mode, total=Decimal('0'), orders=0, refunded=Decimal('0')):
+    """Atomically add deltas to one DailyCollection row, creating it if needed."""
+    deltas = {
+        'total_amount': F('total_amount') + total,
+        'order_count': F('order_count') + orders,
+        'refunded_amount': F('refunded_amount') + refunded,
+        'updated_at': timezone.now(),
+    }
+    row = DailyCollection.objects.filter(business_day=business_day, payment_mode=payment_mode)
+    if row.update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            DailyCollection.objects.create(
+                business_day=business_day,
+                payment_mode=payment_mode,
+                total_amount=total,
+                order_count=orders,
+                refunded_amount=refunded,
+            )
+    except IntegrityError:
+        # Another request created the row first
+        row.update(**deltas)
+
+
+def record_transitions(paid=(), cancelled=()):
+    """
+    Add newly paid orders to, and take cancelled previously-paid orders out
+    of, their payment day. One write per (business day, payment mode), plus
+    one upsert per (business day, hour, item) for the item sales rollup.
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for order, sign in [(order, 1) for order in paid] + [(order, -1) for order in cancelled]:
+        if order.paid_at is None:
+            continue
+        delta = deltas[(business_day_for(order.paid_at), order.payment_mode)]
+        delta[0] += sign * order.total_amount
+        delta[1] += sign
+    for (business_day, payment_mode), (total, orders) in deltas.items():
+        _bump(business_day, payment_mode, total=total, orders=orders)
+    _record_item_sales([(order, 1) for order in paid] + [(order, -1) for order in cancelled])
+
+
+def record_payment(order):
+    record_transitions(paid=[order])
+
+
+def record_cancellation(order):
+    """Take a previously paid order back out of its payment day."""
+    record_transitions(cancelled=[order])
+
+
+def record_refund(order, amount, refunded_at):
+    _bump(business_day_for(refunded_at), order.payment_mode, refunded=amount)
+    items = OrderItem.objects.filter(order_id=order.order_id).values_list('food_id', 'name', 'quantity', 'price')
+    slot = (business_day_for(refunded_at), _local_hour(refunded_at))
+    deltas = {}
+    for (food_id, name), share in allocate_refund(amount, items):
+        deltas.setdefault((*slot, food_id), [name, 0, Decimal('0'), Decimal('0')])[3] += share
+    _bump_items(deltas)
+
+
+def rebuild_daily_collection(date_from=None, date_to=None):
+    """
+    Recompute DailyCollection from paid orders and the refund ledger for
+    [date_from, date_to] (inclusive, either end optional). Returns the number of rows written.
+    """
+    rows = {}
+
+    def row(day, mode):
+        return rows.setdefault((day, mode), DailyCollection(
+            business_day=day, payment_mode=mode,
+            total_amount=Decimal('0'), order_count=0, refunded_amount=Decimal('0'),
+        ))
+
+    paid = in_business_days(
+        Order.objects.filter(status='paid', paid_at__isnull=False), 'paid_at', date_from, date_to
+    ).annotate(day=business_day_of('paid_at')).values('day', 'payment_mode').annotate(total=Sum('total_amount'), orders=Count('order_id'))
+    for entry in paid:
+        target = row(entry['day'], entry['payment_mode'])
+        target.total_amount = entry['total']
+        target.order_count = entry['orders']
+
+    refunded = in_business_days(
+        Refund.objects.all(), 'created_at', date_from, date_to
+    ).annotate(day=business_day_of('created_at')).values('day', 'order__payment_mode').annotate(refunded=Sum('amount'))
+    for entry in refunded:
+        row(entry['day'], entry['order__payment_mode']).refunded_amount = entry['refunded']
+
+    with transaction.atomic():
+        stale = DailyCollection.objects.all()
+        if date_from:
+            stale = stale.filter(business_day__gte=date_from)
+        if date_to:
+            stale = stale.filter(business_day__lte=date_to)
+        stale.delete()
+        DailyCollection.objects.bulk_create(rows.values())
+    return len(rows)
+
+
+# ──────────────────────────────────────────────────────────────
+# Per-item hourly sales
+# ──────────────────────────────────────────────────────────────
+
+def _local_hour(moment):
+    return moment.astimezone(business_timezone()).hour
+
+
+def allocate_refund(amount, items):
+    """
+    Split an order-level refund across its items by subtotal.
+    `items` are (food_id, name, quantity, price); returns [((food_id, name), share)]
+    for tracked items, rounded to the paisa with the remainder on the largest item.
+    """
+    items = [(food_id, name, quantity * price) for food_id, name, quantity, price in items]
+    order_total = sum(subtotal for _, _, subtotal in items)
+    if not order_total:
+        return []
+    shares = [(amount * subtotal / order_total).quantize(CENT) for _, _, subtotal in items]
+    largest = max(range(len(items)), key=lambda index: items[index][2])
+    shares[largest] += amount - sum(shares)
+    return [
+        ((food_id, name), share)
+        for (food_id, name, _), share in zip(items, shares)
+        if food_id is not None and share
+    ]
+
+
+def _bump_items(deltas):
+    """
+    Add {(business_day, hour, food_id): [name, quantity, revenue, refunded]}
+    deltas with one upsert per row; rows are written in key order so
+    concurrent requests lock them in the same order.
+    """
+    if not deltas:
+        return
+    table = connection.ops.quote_name(ItemSalesHourly._meta.db_table)
+    now = timezone.now()
+    rows = [
+        (day, hour, food_id, name, quantity, revenue, refunded, now)
+        for (day, hour, food_id), (name, quantity, revenue, refunded) in sorted(deltas.items())
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"""
+            INSERT INTO {table} (business_day, hour, food_id, name, quantity, revenue, refunded_amount, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (business_day, hour, food_id) DO UPDATE SET
+                name = EXCLUDED.name,
+                quantity = {table}.quantity + EXCLUDED.quantity,
+                revenue = {table}.revenue + EXCLUDED.revenue,
+                refunded_amount = {table}.refunded_amount + EXCLUDED.refunded_amount,
+                updated_at = EXCLUDED.updated_at
+        """, rows)
+
+
+def _record_item_sales(signed_orders):
+    """Add (sign=1) or remove (sign=-1) the items of paid orders in their payment hour."""
+    slots = {
+        order.order_id: (business_day_for(order.paid_at), _local_hour(order.paid_at), sign)
+        for order, sign in signed_orders
+        if order.paid_at is not None
+    }
+    if not slots:
+        return
+    items = OrderItem.objects.filter(order_id__in=slots, food_id__isnull=False).values_list(
+        'order_id', 'food_id', 'name', 'quantity', 'price'
+    )
+    deltas = {}
+    for order_id, food_id, name, quantity, price in items:
+        day, hour, sign = slots[order_id]
+        delta = deltas.setdefault((day, hour, food_id), [name, 0, Decimal('0'), Decimal('0')])
+        delta[1] += sign * quantity
+        delta[2] += sign * quantity * price
+    _bump_items(deltas)
+
+
+def rebuild_item_sales(date_from=None, date_to=None):
+    """
+    Recompute ItemSalesHourly for business days [date_from, date_to]
+    (inclusive, either end optional) from paid orders and the refund ledger.
+    Returns the number of rows written.
+    """
+    tz = business_timezone()
+    rows = {}
+
+    def row(day, hour, food_id, name):
+        return rows.setdefault((day, hour, food_id), ItemSalesHourly(
+            business_day=day, hour=hour, food_id=food_id, name=name,
+            quantity=0, revenue=Decimal('0'), refunded_amount=Decimal('0'),
+        ))
+
+    sold = in_business_days(
+        OrderItem.objects.filter(order__status='paid', order__paid_at__isnull=False, food_id__isnull=False),
+        'order__paid_at', date_from, date_to,
+    ).annotate(
+        day=business_day_of('order__paid_at'),
+        hour=ExtractHour('order__paid_at', tzinfo=tz),
+    ).values('day', 'hour', 'food_id').annotate(
+        sold=Sum('quantity'), total=Sum(F('quantity') * F('price')), item_name=Max('name'),
+    )
+    for entry in sold.iterator():
+        target = row(entry['day'], entry['hour'], entry['food_id'], entry['item_name'])
+        target.quantity = entry['sold']
+        target.revenue = entry['total']
+
+    refunds = in_business_days(Refund.objects.all(), 'created_at', date_from, date_to).prefetch_related('order__items')
+    for refund in refunds:
+        day, hour = business_day_for(refund.created_at), _local_hour(refund.created_at)
+        items = [(item.food_id, item.name, item.quantity, item.price) for item in refund.order.items.all()]
+        for (food_id, name), share in allocate_refund(refund.amount, items):
+            row(day, hour, food_id, name).refunded_amount += share
+
+    with transaction.atomic():
+        stale = ItemSalesHourly.objects.all()
+        if date_from:
+            stale = stale.filter(business_day__gte=date_from)
+        if date_to:
+            stale = stale.filter(business_day__lte=date_to)
+        stale.delete()
+        ItemSalesHourly.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
@@ -0,0 +1,63 @@
+# backend/kot_project/cashier/search.py
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, Exists, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import OrderItem
+
+# order_id is a 32-bit serial
+MAX_ORDER_ID = 2147483647
+
+EXACT_ID_RANK = 2000
+PREFIX_ID_RANK = 1000
+
+
+def order_id_prefix_q(term):
+    """
+    Orders whose id starts with the digits in `term`, as a handful of primary
+    key ranges (12 -> 12, 120-129, 1200-1299, ...) instead of a text cast.
+    """
+    if not term.isdigit() or term.startswith('0'):
+        return Q(pk__in=[])
+    base = int(term)
+    if base > MAX_ORDER_ID:
+        return Q(pk__in=[])
+    condition = Q(pk=base)
+    scale = 10
+    while base * scale <= MAX_ORDER_ID:
+        low, high = base * scale, min((base + 1) * scale - 1, MAX_ORDER_ID)
+        condition |= Q(pk__gte=low, pk__lte=high)
+        scale *= 10
+    return condition
+
+
+def search_orders(queryset, term):
+    """
+    Filter orders by search term and annotate an integer `search_rank`.
+
+    All-digit terms match order ids exactly or by prefix through primary key
+    ranges (exact id ranks first). Other terms match item names with EXISTS
+    against the trigram index on UPPER(name) - no join, no DISTINCT - ranked
+    by the best word similarity among the order's items.
+    """
+    if term.isdigit():
+        exact = Q(pk=int(term)) if int(term) <= MAX_ORDER_ID else Q(pk__in=[])
+        return queryset.filter(order_id_prefix_q(term)).annotate(
+            search_rank=Case(
+                When(exact, then=Value(EXACT_ID_RANK)),
+                default=Value(PREFIX_ID_RANK),
+                output_field=IntegerField(),
+            )
+        )
+
+    item_match = OrderItem.objects.filter(order=OuterRef('pk'), name__icontains=term)
+    best_similarity = Subquery(
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .annotate(similarity=TrigramWordSimilarity(term, 'name'))
+        .order_by('-similarity')
+        .values('similarity')[:1],
+        output_field=FloatField(),
+    )
+    return queryset.filter(Exists(item_match)).annotate(
+        search_rank=Cast(Coalesce(best_similarity, Value(0.0)) * 1000, IntegerField())
+    )
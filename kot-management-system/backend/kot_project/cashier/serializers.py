@@ -2,12 +2,9 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
 from decimal import Decimal
-from management.models import FoodItem
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    category = serializers.SerializerMethodField()
-
     class Meta:
         model = OrderItem
         fields = [
@@ -18,15 +15,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "quantity",
             "category",
         ]
-
-    def get_category(self, obj):
-        if not obj.food_id:
-            return None
-        try:
-            food = FoodItem.objects.only('category').get(food_id=obj.food_id)
-            return food.category
-        except FoodItem.DoesNotExist:
-            return None
+        read_only_fields = ["category"]
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -58,8 +47,10 @@ class OrderSerializer(serializers.ModelSerializer):
             'items',
             'waiter_name'
         ]
+        # Status and refunds only change through the order actions, which keep
+        # the rollups, portions and events in step
         read_only_fields = [
-            'balance_amount', 'created_at', 'paid_at', 'refunded_at',
+            'balance_amount', 'status', 'created_at', 'updated_at', 'paid_at', 'refunded_at',
             'refunded_amount', 'is_refunded', 'refund_reason'
         ]
 
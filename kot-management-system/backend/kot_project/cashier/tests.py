@@ -1,3 +1,1009 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from management.models import AdminUser, FoodItem, RestaurantTable, TableSeat
+
+from .business_day import business_day_for, business_day_range, local_time_now
+from .events import ORDER_CREATED, ORDER_PAID, InProcessBroker, PostgresBroker, set_broker
+from .exports import EXPORT_CHUNK_SIZE, claim_next_job, export_path, run_export_job
+from .filters import filter_orders
+from .forecast import forecast_demand
+from .models import DailyCollection, ExportJob, IdempotencyKey, ItemSalesHourly, Order, OrderItem, Refund
+from .rollups import allocate_refund, rebuild_daily_collection, rebuild_item_sales
+from .search import EXACT_ID_RANK, PREFIX_ID_RANK, search_orders
+from .sync import feed_state
+
+
+class OrderEventTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = InProcessBroker()
+        set_broker(self.broker)
+        self.addCleanup(set_broker, None)
+
+    def test_actions_publish_to_matching_subscribers(self):
+        order = Order.objects.create(table_number=3, total_amount=100, received_amount=0)
+        other = Order.objects.create(table_number=4, total_amount=50, received_amount=0)
+        per_order, cashier = [], []
+        self.broker.subscribe(per_order.append, order_id=order.order_id)
+        self.broker.subscribe(cashier.append, role='cashier')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/cashier-orders/{order.order_id}/mark_paid/')
+            self.client.post(f'/api/cashier-orders/{other.order_id}/mark_paid/')
+
+        self.assertEqual([e['order_id'] for e in per_order], [order.order_id])
+        self.assertEqual(per_order[0]['type'], ORDER_PAID)
+        self.assertEqual(len(cashier), 2)
+
+    def test_waiter_role_only_sees_own_orders_and_not_creation(self):
+        received = []
+        self.broker.subscribe(received.append, role='waiter', waiter_id=7)
+        self.broker.publish({'type': ORDER_CREATED, 'order_id': 1, 'waiter_id': 7})
+        self.broker.publish({'type': ORDER_PAID, 'order_id': 2, 'waiter_id': 8})
+        self.broker.publish({'type': ORDER_PAID, 'order_id': 3, 'waiter_id': 7})
+        self.assertEqual([e['order_id'] for e in received], [3])
+
+    def test_stream_refused_under_wsgi(self):
+        response = self.client.get('/api/order-events/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream_served_under_asgi(self):
+        response = await AsyncClient().get('/api/order-events/', {'role': 'cashier'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+        await chunks.aclose()
+
+
+@skipUnless(connection.vendor == 'postgresql', "LISTEN/NOTIFY is PostgreSQL-specific")
+class PostgresBrokerTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_event_reaches_subscriber_of_another_broker(self):
+        publisher, listener = PostgresBroker(), PostgresBroker()
+        self.addCleanup(publisher.close)
+        self.addCleanup(listener.close)
+        received, arrived = [], threading.Event()
+
+        def deliver(event):
+            received.append(event)
+            arrived.set()
+
+        listener.subscribe(deliver, role='cashier')
+        publisher.publish({'type': ORDER_PAID, 'order_id': 5, 'waiter_id': None})
+
+        self.assertTrue(arrived.wait(5))
+        self.assertEqual(received, [{'type': ORDER_PAID, 'order_id': 5, 'waiter_id': None}])
+
+
+class OrderListQueryTests(TestCase):
+    def place(self, count):
+        for i in range(count):
+            waiter = AdminUser.objects.create(username=f'list-waiter-{count}-{i}', role='waiter')
+            order = Order.objects.create(table_number=1, total_amount=10, received_amount=0, waiter=waiter)
+            OrderItem.objects.create(order=order, name='Tea', quantity=1, price=10)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        for count in (2, 20):
+            self.place(count)
+            # feed state, orders joined to waiter, prefetched items
+            with self.assertNumQueries(3):
+                response = APIClient().get('/api/cashier-orders/', {'page_size': 50})
+            self.assertTrue(all(order['waiter_name'] for order in response.data['results']))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Same created_at for all, so order_id alone has to break the ties
+        created = timezone.now()
+        self.ids = [
+            Order.objects.create(table_number=1, total_amount=10, received_amount=0).pk for _ in range(5)
+        ]
+        Order.objects.update(created_at=created)
+
+    def test_pages_follow_order_id_on_tied_timestamps(self):
+        seen, url, pages = [], '/api/cashier-orders/?page_size=2', 0
+        while url:
+            data = self.client.get(url).data
+            seen += [order['order_id'] for order in data['results']]
+            url, pages = data['next'], pages + 1
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+        self.assertEqual(pages, 3)
+
+    def test_last_page_has_no_next_link(self):
+        data = self.client.get('/api/cashier-orders/', {'page_size': 5}).data
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_malformed_cursor_is_rejected(self):
+        two_parts = base64.urlsafe_b64encode(b'not-a-date|7').decode()
+        three_parts = base64.urlsafe_b64encode(b'1|2026-01-01T00:00:00+00:00|7').decode()
+        for cursor in ('garbage!', two_parts, three_parts, 'w6k='):
+            response = self.client.get('/api/cashier-orders/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_unpaginated_list_is_unchanged(self):
+        response = self.client.get('/api/cashier-orders/')
+        self.assertEqual(len(response.data), 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Trigram similarity is PostgreSQL-specific")
+class OrderSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def place(self, *names):
+        order = Order.objects.create(table_number=1, total_amount=10, received_amount=0)
+        for name in names:
+            OrderItem.objects.create(order=order, name=name, quantity=1, price=10)
+        return order.pk
+
+    def ranked(self, term):
+        return list(
+            search_orders(Order.objects.all(), term)
+            .order_by('-search_rank', '-created_at', '-order_id')
+            .values_list('pk', 'search_rank')
+        )
+
+    def test_whole_word_match_outranks_match_inside_a_word(self):
+        inside = self.place('Paneer Tikka')
+        whole = self.place('Pan Cake')
+        self.place('Masala Tea')
+
+        ranked = self.ranked('pan')
+        self.assertEqual([pk for pk, _ in ranked], [whole, inside])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+
+    def test_item_match_uses_exists_and_returns_each_order_once(self):
+        both = self.place('Plain Dosa', 'Masala Dosa')
+        one = self.place('Dosa', 'Tea')
+
+        self.assertEqual(sorted(pk for pk, _ in self.ranked('dosa')), sorted([both, one]))
+        sql = str(search_orders(Order.objects.all(), 'dosa').query).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_exact_order_id_ranks_before_prefix_matches(self):
+        ids = [self.place('Tea') for _ in range(12)]
+        first = ids[0]
+        ranked = self.ranked(str(first))
+        self.assertEqual(ranked[0], (first, EXACT_ID_RANK))
+        self.assertTrue(all(rank == PREFIX_ID_RANK for _, rank in ranked[1:]))
+
+    def test_paging_past_the_first_ranked_page(self):
+        for names in (['Pan Cake'], ['Paneer Tikka'], ['Japanese Rice'], ['Pan Cake', 'Paneer Roll'], ['Spanish Omelette']):
+            self.place(*names)
+        self.place('Tea')
+        expected = [pk for pk, _ in self.ranked('pan')]
+        self.assertEqual(len(expected), 5)
+
+        seen, url = [], '/api/orders/?search=pan&page_size=2'
+        while url:
+            data = self.client.get(url).data
+            self.assertLessEqual(len(data['orders']), 2)
+            seen += [order['order_id'] for order in data['orders']]
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+
+class SyncFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_orders_leaving_the_status_filter_become_tombstones(self):
+        staying = Order.objects.create(table_number=1, total_amount=10, received_amount=0)
+        leaving = Order.objects.create(table_number=2, total_amount=10, received_amount=0)
+        token = self.client.get('/api/cashier-orders/', {'status': 'pending', 'since': '0'}).data['sync_token']
+
+        self.client.post(f'/api/cashier-orders/{leaving.pk}/mark_paid/')
+        delta = self.client.get('/api/cashier-orders/', {'status': 'pending', 'since': token}).data
+        self.assertEqual([order['order_id'] for order in delta['orders']], [staying.pk])
+        self.assertEqual([(t['order_id'], t['status']) for t in delta['tombstones']], [(leaving.pk, 'paid')])
+
+        paid = self.client.get('/api/cashier-orders/', {'status': 'paid', 'since': token}).data
+        self.assertEqual([order['order_id'] for order in paid['orders']], [leaving.pk])
+        self.assertEqual([t['order_id'] for t in paid['tombstones']], [staying.pk])
+
+    def test_deleted_orders_are_tombstoned_and_change_the_etag(self):
+        order = Order.objects.create(table_number=1, total_amount=10, received_amount=0)
+        first = self.client.get('/api/cashier-orders/', {'since': '0'})
+        self.assertEqual(
+            self.client.get('/api/cashier-orders/', {'since': '0'}, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304,
+        )
+
+        self.assertEqual(self.client.delete(f'/api/cashier-orders/{order.pk}/').status_code, 204)
+        after = self.client.get('/api/cashier-orders/', {'since': first.data['sync_token']},
+                                HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.data['orders'], [])
+        self.assertEqual(after.data['tombstones'][0]['order_id'], order.pk)
+        self.assertEqual(after.data['tombstones'][0]['status'], 'deleted')
+
+    def test_feed_state_is_one_query(self):
+        Order.objects.create(table_number=1, total_amount=10, received_amount=0)
+        with self.assertNumQueries(1):
+            state = feed_state()
+        self.assertEqual(state['last_change'], Order.objects.get().updated_at)
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are PostgreSQL-specific")
+class OrderQueryPlanTests(TestCase):
+    """
+    The hot order queries must be served by an index, not a sequential
+    scan, once the table has a realistic size and statistics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.waiters = [
+            AdminUser.objects.create(username=f'plan-waiter-{i}', role='waiter') for i in range(20)
+        ]
+        orders = []
+        for i in range(10000):
+            created = now - timedelta(minutes=53 * i)
+            status = 'pending' if i % 50 == 0 else ('cancelled' if i % 17 == 0 else 'paid')
+            orders.append(Order(
+                table_number=i % 30 + 1,
+                total_amount=Decimal('120.00'),
+                received_amount=Decimal('120.00'),
+                payment_mode=('cash', 'card', 'upi')[i % 3],
+                status=status,
+                paid_at=created if status == 'paid' else None,
+                waiter=cls.waiters[i % 20],
+            ))
+        Order.objects.bulk_create(orders, batch_size=2000)
+        # auto_now_add ignores explicit values; spread the history afterwards
+        for i, order in enumerate(orders):
+            order.created_at = now - timedelta(minutes=53 * i)
+        Order.objects.bulk_update(orders, ['created_at'], batch_size=2000)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.order_id, name=f'Item {j}', quantity=1, price=Decimal('60.00'), food_id=(order.order_id + j) % 100)
+            for order in orders for j in range(2)
+        ], batch_size=5000)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Order._meta.db_table}')
+            cursor.execute(f'ANALYZE {OrderItem._meta.db_table}')
+        cls.now = now
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, msg=f"Sequential scan in plan:\n{plan}")
+
+    def test_pending_queue(self):
+        self.assertIndexed(Order.objects.filter(status='pending').order_by('-created_at', '-order_id')[:50])
+
+    def test_waiter_history(self):
+        day_ago = self.now - timedelta(days=1)
+        self.assertIndexed(Order.objects.filter(waiter=self.waiters[3], created_at__gte=day_ago, created_at__lt=self.now))
+
+    def test_collection_by_payment_mode(self):
+        day_ago = self.now - timedelta(days=1)
+        self.assertIndexed(Order.objects.filter(
+            status='paid', payment_mode='cash', paid_at__gte=day_ago, paid_at__lt=self.now
+        ))
+
+    def test_item_analytics(self):
+        self.assertIndexed(OrderItem.objects.filter(food_id=42))
+
+
+class StreamingCsvTests(TestCase):
+    ROWS = EXPORT_CHUNK_SIZE + 250
+
+    def setUp(self):
+        orders = Order.objects.bulk_create(
+            Order(table_number=1, total_amount=20, received_amount=20) for _ in range(self.ROWS)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, name='Idli', quantity=1, price=20) for order in orders
+        )
+
+    def test_download_streams_from_a_chunked_cursor(self):
+        with patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            # Nothing is read until the body is consumed
+            with self.assertNumQueries(0):
+                response = APIClient().get('/api/orders/download-csv/')
+                chunks = iter(response.streaming_content)
+            self.assertTrue(response.streaming)
+
+            # One cursor over the orders, one item query per chunk of orders
+            with self.assertNumQueries(3):
+                lines = b''.join(chunks).decode().splitlines()
+
+        iterator.assert_called_once()
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': EXPORT_CHUNK_SIZE})
+        self.assertEqual(len(lines), 1 + self.ROWS)
+        self.assertTrue(lines[1].startswith(str(Order.objects.latest('created_at', 'order_id').pk)))
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root, ignore_errors=True)
+        overrides = override_settings(EXPORT_ROOT=export_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        for table in (1, 2, 2):
+            order = Order.objects.create(table_number=table, total_amount=40, received_amount=50)
+            OrderItem.objects.create(order=order, name='Idli', quantity=2, price=20)
+
+    def run_job(self, body):
+        created = self.client.post('/api/orders/exports/', body, format='json')
+        self.assertEqual(created.status_code, 202)
+        self.assertEqual(created.data['status'], 'queued')
+        call_command('run_export_worker', '--once', stdout=StringIO())
+        return self.client.get(f"/api/orders/exports/{created.data['job_id']}/").data
+
+    def test_csv_job_applies_filters_and_is_downloadable(self):
+        status = self.run_job({'format': 'csv', 'table_number': 2})
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['processed_rows'], status['total_rows'], status['progress']), (2, 2, 100))
+
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('2x Idli @ ₹20.00', lines[1])
+
+    def test_ndjson_job_writes_one_order_per_line(self):
+        status = self.run_job({'format': 'ndjson'})
+        job = ExportJob.objects.get(pk=status['job_id'])
+        with gzip.open(export_path(job), 'rt') as fh:
+            records = [json.loads(line) for line in fh]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['items'][0]['subtotal'], '40.00')
+
+    def test_stale_running_job_is_reclaimed(self):
+        stale = ExportJob.objects.create(
+            format='csv', status='running', claimed_at=timezone.now() - timedelta(hours=1),
+        )
+        live = ExportJob.objects.create(format='csv', status='running', claimed_at=timezone.now())
+
+        with self.assertLogs('cashier.exports', 'WARNING'):
+            call_command('run_export_worker', '--once', stdout=StringIO())
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((stale.status, stale.processed_rows), ('done', 3))
+        self.assertTrue(export_path(stale).exists())
+        self.assertEqual(live.status, 'running')
+
+    def test_worker_that_lost_its_claim_abandons_the_job(self):
+        ExportJob.objects.create(format='csv')
+        job = claim_next_job()
+        # Another worker took it over after this one went quiet
+        ExportJob.objects.filter(pk=job.pk).update(claimed_at=timezone.now() + timedelta(seconds=1))
+
+        with self.assertLogs('cashier.exports', 'WARNING'):
+            run_export_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.file_name), ('running', ''))
+        self.assertEqual(list(Path(settings.EXPORT_ROOT).iterdir()), [])
+
+    def test_unknown_format_and_unfinished_download_are_rejected(self):
+        self.assertEqual(self.client.post('/api/orders/exports/', {'format': 'pdf'}).status_code, 400)
+        job = ExportJob.objects.create(format='csv')
+        self.assertEqual(self.client.get(f'/api/orders/exports/{job.pk}/download/').status_code, 409)
+
+
+@override_settings(BUSINESS_DAY_TIME_ZONE='Asia/Kolkata', BUSINESS_DAY_CUTOFF_HOUR=4)
+class BusinessDayTests(TestCase):
+    def test_late_night_belongs_to_previous_day(self):
+        start, end = business_day_range(date(2026, 3, 10))
+        # 04:00 IST is 22:30 UTC the previous calendar day
+        self.assertEqual(start, datetime(2026, 3, 9, 22, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(end - start, timedelta(days=1))
+        self.assertEqual(business_day_for(end - timedelta(microseconds=1)), date(2026, 3, 10))
+        self.assertEqual(business_day_for(end), date(2026, 3, 11))
+
+    def test_filters_use_timestamp_ranges(self):
+        start, end = business_day_range(date(2026, 3, 10))
+        inside = Order.objects.create(table_number=1, total_amount=10, received_amount=10)
+        outside = Order.objects.create(table_number=1, total_amount=10, received_amount=10)
+        Order.objects.filter(pk=inside.pk).update(created_at=end - timedelta(minutes=1))
+        Order.objects.filter(pk=outside.pk).update(created_at=end)
+
+        qs = filter_orders(Order.objects.all(), {'date_from': '2026-03-10', 'date_to': '2026-03-10'})
+        self.assertEqual(list(qs.values_list('pk', flat=True)), [inside.pk])
+        self.assertNotIn('::date', str(qs.query))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        _, end = business_day_range(date(2026, 3, 10))
+        late = Order.objects.create(table_number=1, total_amount=70, received_amount=70, payment_mode='upi')
+        self.client.post(f'/api/cashier-orders/{late.pk}/mark_paid/')
+        Order.objects.filter(pk=late.pk).update(paid_at=end - timedelta(hours=1))
+        DailyCollection.objects.all().delete()
+
+        rebuild_daily_collection()
+        row = DailyCollection.objects.get()
+        self.assertEqual((row.business_day, row.payment_mode, row.total_amount), (date(2026, 3, 10), 'upi', 70))
+
+
+def collection_rows():
+    return sorted(DailyCollection.objects.values_list(
+        'business_day', 'payment_mode', 'total_amount', 'order_count', 'refunded_amount',
+    ))
+
+
+class DailyCollectionRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def place(self, total, mode):
+        return Order.objects.create(table_number=1, total_amount=total, received_amount=total, payment_mode=mode).pk
+
+    def test_incremental_totals_match_rebuild(self):
+        cash = [self.place(100, 'cash'), self.place(40, 'cash'), self.place(25, 'cash')]
+        upi = [self.place(60, 'upi'), self.place(80, 'upi')]
+        card = self.place(300, 'card')
+        self.place(55, 'cash')  # stays pending
+
+        self.client.post(f'/api/cashier-orders/{cash[0]}/mark_paid/')
+        self.client.post('/api/cashier-orders/bulk_status/', {
+            'order_ids': cash[1:] + upi + [card], 'status': 'paid',
+        }, format='json')
+        self.client.post(f'/api/cashier-orders/{cash[2]}/cancel_order/')
+        self.client.post('/api/cashier-orders/bulk_status/', {'order_ids': [upi[1]], 'status': 'cancelled'}, format='json')
+        self.client.post(f'/api/cashier-orders/{cash[0]}/refund/', {'amount': '30'}, format='json')
+        self.client.post(f'/api/cashier-orders/{card}/refund/', {'amount': '300'}, format='json')
+
+        incremental = collection_rows()
+        self.assertEqual([(mode, total, count, refunded) for _, mode, total, count, refunded in incremental], [
+            ('card', Decimal('300.00'), 1, Decimal('300.00')),
+            ('cash', Decimal('140.00'), 2, Decimal('30.00')),
+            ('upi', Decimal('60.00'), 1, Decimal('0.00')),
+        ])
+        rebuild_daily_collection()
+        self.assertEqual(collection_rows(), incremental)
+
+
+class ConcurrentCollectionTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_first_payments_of_the_day_race_into_one_row(self):
+        order_ids = [
+            Order.objects.create(table_number=1, total_amount=10 * (i + 1), received_amount=0).pk for i in range(4)
+        ]
+        barrier = threading.Barrier(len(order_ids))
+
+        def pay(order_id):
+            try:
+                barrier.wait()
+                return APIClient().post(f'/api/cashier-orders/{order_id}/mark_paid/').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(order_ids)) as pool:
+            self.assertEqual(list(pool.map(pay, order_ids)), [200] * len(order_ids))
+        incremental = collection_rows()
+        self.assertEqual([(total, count) for _, _, total, count, _ in incremental], [(Decimal('100.00'), 4)])
+        rebuild_daily_collection()
+        self.assertEqual(collection_rows(), incremental)
+
+
+@override_settings(BUSINESS_DAY_TIME_ZONE='Asia/Kolkata', BUSINESS_DAY_CUTOFF_HOUR=4)
+class SalesReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        start, _ = business_day_range(date(2026, 3, 10))
+        for offset, amount, mode, order_status in (
+            (timedelta(hours=2), 100, 'cash', 'paid'),
+            (timedelta(hours=23), 50, 'upi', 'paid'),    # 03:00 next morning, same business day
+            (timedelta(days=2, hours=1), 30, 'cash', 'paid'),
+            (timedelta(hours=3), 999, 'cash', 'cancelled'),
+        ):
+            order = Order.objects.create(
+                table_number=1, total_amount=amount, received_amount=amount,
+                payment_mode=mode, status=order_status,
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=start + offset)
+
+    def report(self, **params):
+        response = self.client.get('/api/cashier-orders/sales_report/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_daily_buckets_include_empty_days(self):
+        report = self.report(bucket='day', date_from='2026-03-10', date_to='2026-03-12')
+        self.assertEqual(
+            [(row['bucket'], row['revenue'], row['order_count']) for row in report['series']],
+            [('2026-03-10', 150.0, 2), ('2026-03-11', 0.0, 0), ('2026-03-12', 30.0, 1)],
+        )
+        self.assertEqual(report['totals']['average_ticket'], 60.0)
+
+    def test_filters_and_hourly_buckets(self):
+        report = self.report(bucket='hour', date_from='2026-03-10', payment_mode='cash', date_to='2026-03-10')
+        self.assertEqual(len(report['series']), 24)
+        self.assertEqual(report['series'][2]['revenue'], 100.0)
+        self.assertEqual(report['totals']['order_count'], 1)
+
+        everything = self.report(bucket='month', date_from='2026-03-01', date_to='2026-03-31', status='all')
+        self.assertEqual(everything['totals']['order_count'], 4)
+
+    def test_closed_periods_are_cached(self):
+        first = self.report(bucket='week', date_from='2026-03-09', date_to='2026-03-15')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.report(bucket='week', date_from='2026-03-09', date_to='2026-03-15'), first)
+
+    def test_rejects_unknown_bucket(self):
+        response = self.client.get('/api/cashier-orders/sales_report/', {'bucket': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_ranges_longer_than_the_bucket_allows(self):
+        def report(bucket, date_from):
+            return self.client.get('/api/cashier-orders/sales_report/', {
+                'bucket': bucket, 'date_from': date_from, 'date_to': '2026-03-31',
+            })
+
+        with self.assertNumQueries(0):
+            hourly = report('hour', '2020-01-01')
+        self.assertEqual(hourly.status_code, 400)
+        self.assertIn('at most 92 days', hourly.data['detail'])
+        self.assertEqual(len(report('hour', '2025-12-30').data['series']), 92 * 24)
+        self.assertEqual(report('day', '2020-01-01').status_code, 400)
+        self.assertEqual(report('month', '2020-01-01').status_code, 200)
+
+
+class ItemSalesRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def place(self, *items):
+        order = Order.objects.create(table_number=1, total_amount=0, received_amount=0)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, food_id=food_id, name=name, quantity=quantity, price=price)
+            for food_id, name, quantity, price in items
+        ])
+        return order
+
+    def snapshot(self):
+        return sorted(ItemSalesHourly.objects.values_list(
+            'business_day', 'hour', 'food_id', 'quantity', 'revenue', 'refunded_amount'
+        ))
+
+    def test_incremental_rollup_matches_rebuild(self):
+        dosa, tea = (1, 'Masala Dosa', 2, Decimal('60')), (2, 'Masala Tea', 3, Decimal('20'))
+        first = self.place(dosa, tea)
+        second = self.place(dosa)
+        cancelled = self.place(tea, (None, 'Custom', 1, Decimal('5')))
+        for order in (first, second, cancelled):
+            self.client.post(f'/api/cashier-orders/{order.pk}/mark_paid/')
+        Order.objects.filter(pk__in=[first.pk, second.pk, cancelled.pk]).update(total_amount=500)
+        self.client.post(f'/api/cashier-orders/{first.pk}/refund/', {'amount': '18'})
+        self.client.post(f'/api/cashier-orders/{cancelled.pk}/cancel_order/')
+
+        incremental = self.snapshot()
+        totals = ItemSalesHourly.objects.values('food_id').annotate(sold=Sum('quantity'), refunded=Sum('refunded_amount'))
+        self.assertEqual(
+            {row['food_id']: (row['sold'], row['refunded']) for row in totals},
+            {1: (4, Decimal('12.00')), 2: (3, Decimal('6.00'))},
+        )
+
+        rebuild_item_sales()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_refund_allocation_keeps_every_paisa(self):
+        shares = allocate_refund(Decimal('10.00'), [(1, 'A', 1, Decimal('1')), (2, 'B', 1, Decimal('1')), (3, 'C', 1, Decimal('1'))])
+        self.assertEqual(sum(share for _, share in shares), Decimal('10.00'))
+
+    def test_top_items_and_trend_endpoints(self):
+        order = self.place((1, 'Masala Dosa', 1, Decimal('60')), (2, 'Masala Tea', 4, Decimal('20')))
+        self.client.post(f'/api/cashier-orders/{order.pk}/mark_paid/')
+
+        by_quantity = self.client.get('/api/cashier-orders/top_items/', {'limit': 1}).data['items']
+        by_revenue = self.client.get('/api/cashier-orders/top_items/', {'by': 'revenue'}).data['items']
+        self.assertEqual([item['name'] for item in by_quantity], ['Masala Tea'])
+        self.assertEqual([item['food_id'] for item in by_revenue], [2, 1])
+
+        trend = self.client.get('/api/cashier-orders/item_trend/', {'food_id': 1, 'bucket': 'hour_of_day'}).data
+        self.assertEqual(len(trend['series']), 24)
+        self.assertEqual(sum(point['quantity'] for point in trend['series']), 1)
+        self.assertEqual(self.client.get('/api/cashier-orders/item_trend/').status_code, 400)
+
+    def test_report_ranges_are_capped_per_bucket(self):
+        def get(path, **params):
+            return self.client.get(f'/api/cashier-orders/{path}/', {'date_to': '2026-03-31', **params})
+
+        hourly = get('item_trend', food_id=1, bucket='hour', date_from='1900-01-01')
+        self.assertEqual(hourly.status_code, 400)
+        self.assertIn('at most 92 days', hourly.data['detail'])
+        self.assertEqual(len(get('item_trend', food_id=1, bucket='hour', date_from='2025-12-30').data['series']), 92 * 24)
+        self.assertEqual(get('item_trend', food_id=1, bucket='day', date_from='2024-01-01').status_code, 400)
+        self.assertEqual(get('item_trend', food_id=1, bucket='hour_of_day', date_from='2024-01-01').status_code, 400)
+        self.assertEqual(get('top_items', date_from='1900-01-01').status_code, 400)
+        self.assertEqual(get('top_items', date_from='2024-04-01').status_code, 200)
+
+
+@override_settings(BUSINESS_DAY_CUTOFF_HOUR=4)
+class DemandForecastTests(TestCase):
+    def test_same_weekday_pattern_is_forecast_per_hour(self):
+        target = date(2026, 3, 17)  # Tuesday
+        rows = []
+        for week in range(1, 9):
+            tuesday = target - timedelta(weeks=week)
+            rows.append(ItemSalesHourly(business_day=tuesday, hour=13, food_id=1, name='Masala Dosa', quantity=3))
+            rows.append(ItemSalesHourly(business_day=tuesday, hour=1, food_id=1, name='Masala Dosa', quantity=1))
+            # Busy Saturdays must not leak into a Tuesday forecast
+            rows.append(ItemSalesHourly(business_day=tuesday + timedelta(days=4), hour=13, food_id=1, name='Masala Dosa', quantity=50))
+        # New item, sold only the last two Tuesdays
+        rows.append(ItemSalesHourly(business_day=target - timedelta(weeks=1), hour=9, food_id=2, name='Filter Coffee', quantity=4))
+        rows.append(ItemSalesHourly(business_day=target - timedelta(weeks=2), hour=9, food_id=2, name='Filter Coffee', quantity=4))
+        ItemSalesHourly.objects.bulk_create(rows)
+
+        forecast = {row['food_id']: row for row in forecast_demand(target, weeks=12)}
+        self.assertEqual(forecast[1]['expected_quantity'], 4.0)
+        self.assertEqual((forecast[1]['hourly'][13], forecast[1]['hourly'][1]), (3.0, 1.0))
+        self.assertEqual(forecast[1]['peak_hour'], 13)
+        self.assertEqual(forecast[2]['expected_quantity'], 4.0)
+
+    def test_endpoint_defaults_to_next_business_day(self):
+        response = APIClient().get('/api/food-menu/demand_forecast/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'], [])
+        self.assertEqual(APIClient().get('/api/food-menu/demand_forecast/', {'weeks': 'x'}).status_code, 400)
+
+
+class PortionInventoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.vada = FoodItem.objects.create(food_name='Vada', price=20, portions_left=3)
+        self.tea = FoodItem.objects.create(food_name='Tea', price=15)
+
+    def order(self, *lines):
+        return self.client.post('/api/cashier-orders/create_order/', {
+            'table_number': 1,
+            'cart': [{'food_id': food.food_id, 'quantity': quantity} for food, quantity in lines],
+        }, format='json')
+
+    def vada_state(self):
+        self.vada.refresh_from_db()
+        return self.vada.portions_left, self.vada.stock_status
+
+    def test_orders_take_portions_and_cancel_gives_them_back(self):
+        first = self.order((self.vada, 1), (self.tea, 5), (self.vada, 1))
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.vada_state(), (1, 'in_stock'))
+
+        short = self.order((self.tea, 1), (self.vada, 2))
+        self.assertEqual(short.status_code, 409)
+        self.assertEqual(short.data['errors'], [{'food_id': self.vada.food_id, 'error': 'Not enough Vada left'}])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.vada_state(), (1, 'in_stock'))
+
+        self.assertEqual(self.order((self.vada, 1)).status_code, 201)
+        self.assertEqual(self.vada_state(), (0, 'out_of_stock'))
+
+        self.client.post(f"/api/cashier-orders/{first.data['order_id']}/cancel_order/")
+        self.assertEqual(self.vada_state(), (2, 'in_stock'))
+        self.tea.refresh_from_db()
+        self.assertIsNone(self.tea.portions_left)
+
+
+class CreateOrderValidationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tea = FoodItem.objects.create(food_name='Tea', price=Decimal('15.00'))
+        self.vada = FoodItem.objects.create(food_name='Vada', price=20, portions_left=1)
+        table = RestaurantTable.objects.create(table_number='4')
+        self.seat = TableSeat.objects.create(table=table, seat_number='4A', row_number=1, seat_label='A')
+
+    def order(self, cart, **extra):
+        return self.client.post('/api/cashier-orders/create_order/', {
+            'table_number': 4, 'cart': cart, **extra,
+        }, format='json')
+
+    def test_unavailable_and_out_of_window_items_are_rejected(self):
+        sold_out = FoodItem.objects.create(food_name='Dosa', price=40, stock_status='out_of_stock')
+        now = datetime.combine(date.today(), local_time_now())
+        closed = FoodItem.objects.create(
+            food_name='Biryani', price=120, is_timing_active=True,
+            start_time=(now + timedelta(hours=2)).time(), end_time=(now + timedelta(hours=3)).time(),
+        )
+        inactive = FoodItem.objects.create(food_name='Old special', price=50, is_active=False)
+
+        response = self.order([
+            {'food_id': self.tea.food_id, 'quantity': 1},
+            {'food_id': sold_out.food_id},
+            {'food_id': closed.food_id},
+            {'food_id': inactive.food_id},
+            {'food_id': 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['index'], e['error']) for e in response.data['errors']], [
+            (1, 'Dosa is not available now'),
+            (2, 'Biryani is not available now'),
+            (3, 'Food item not found'),
+            (4, 'Food item not found'),
+        ])
+        self.assertFalse(Order.objects.exists())
+
+    def test_bad_quantities_are_rejected(self):
+        response = self.order([
+            {'food_id': self.tea.food_id, 'quantity': 0},
+            {'food_id': self.tea.food_id, 'quantity': 'two'},
+            {'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['error'] for e in response.data['errors']], [
+            'quantity must be at least 1', 'food_id and quantity must be integers', 'food_id is required',
+        ])
+        self.assertFalse(Order.objects.exists())
+
+    def test_received_amount_must_be_a_finite_non_negative_amount(self):
+        cart = [{'food_id': self.tea.food_id, 'quantity': 1}]
+        for received in ('-50', 'NaN', 'Infinity', 'abc', '1e12'):
+            response = self.order(cart, received_amount=received)
+            self.assertEqual(response.status_code, 400, received)
+            self.assertIn('received_amount', response.data['detail'])
+        self.assertFalse(Order.objects.exists())
+
+        self.assertEqual(self.order(cart, received_amount='20.005').status_code, 201)
+        self.assertEqual(Order.objects.get().received_amount, Decimal('20.00'))
+
+    def test_price_comes_from_the_menu(self):
+        response = self.order([{'food_id': self.tea.food_id, 'quantity': 2, 'price': 1}], total_amount=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('30.00'))
+
+    def test_one_failing_item_rolls_back_the_whole_order(self):
+        response = self.order(
+            [{'food_id': self.tea.food_id, 'quantity': 1}, {'food_id': self.vada.food_id, 'quantity': 2}],
+            selected_seats=['4A'],
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.seat.refresh_from_db()
+        self.assertTrue(self.seat.is_available)
+        self.vada.refresh_from_db()
+        self.assertEqual(self.vada.portions_left, 1)
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = InProcessBroker()
+        set_broker(self.broker)
+        self.addCleanup(set_broker, None)
+        self.events = []
+        self.broker.subscribe(self.events.append, role='admin')
+        self.vada = FoodItem.objects.create(food_name='Vada', price=20, portions_left=5)
+
+    def place(self, quantity=1):
+        order = Order.objects.create(table_number=1, total_amount=20 * quantity, received_amount=0)
+        OrderItem.objects.create(order=order, food_id=self.vada.food_id, name='Vada', quantity=quantity, price=20)
+        return order
+
+    def bulk(self, order_ids, target):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/cashier-orders/bulk_status/', {
+                'order_ids': order_ids, 'status': target,
+            }, format='json')
+
+    def test_stale_source_status_changes_nothing(self):
+        order = self.place()
+        # Another till cancels it after this one loaded it as pending
+        self.assertEqual(self.bulk([order.pk], 'cancelled').data['updated_count'], 1)
+        self.events.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/cashier-orders/{order.pk}/mark_paid/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], "Cannot change a cancelled order to paid")
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.paid_at), ('cancelled', None))
+        self.assertFalse(DailyCollection.objects.exists())
+        self.assertEqual(self.events, [])
+
+    def test_mixed_batch_reports_each_order_and_applies_side_effects(self):
+        pending, paid, cancelled = self.place(1), self.place(2), self.place(1)
+        self.bulk([paid.pk], 'paid')
+        self.bulk([cancelled.pk], 'cancelled')
+        self.assertEqual(DailyCollection.objects.get().total_amount, Decimal('40.00'))
+        self.vada.refresh_from_db()
+        portions_before = self.vada.portions_left
+        self.events.clear()
+
+        response = self.bulk([pending.pk, paid.pk, cancelled.pk, 999999, str(pending.pk)], 'cancelled')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(response.data['results'], [
+            {'order_id': pending.pk, 'success': True, 'status': 'cancelled', 'previous_status': 'pending'},
+            {'order_id': paid.pk, 'success': True, 'status': 'cancelled', 'previous_status': 'paid'},
+            {'order_id': cancelled.pk, 'success': False, 'error': "Order already cancelled"},
+            {'order_id': 999999, 'success': False, 'error': "Order not found"},
+        ])
+
+        # The paid order leaves its collection day; only pending ones never entered it
+        collection = DailyCollection.objects.get()
+        self.assertEqual((collection.total_amount, collection.order_count), (Decimal('0.00'), 0))
+        self.assertEqual(ItemSalesHourly.objects.aggregate(total=Sum('quantity'))['total'], 0)
+        # Only the two newly cancelled orders give their portions back
+        self.vada.refresh_from_db()
+        self.assertEqual(self.vada.portions_left, portions_before + 1 + 2)
+        self.assertEqual(
+            sorted((event['type'], event['order_id']) for event in self.events),
+            sorted([('order.cancelled', pending.pk), ('order.cancelled', paid.pk)]),
+        )
+
+    def test_status_cannot_be_edited_directly(self):
+        order = self.place()
+        self.bulk([order.pk], 'cancelled')
+        for method in (self.client.patch, self.client.put):
+            response = method(f'/api/cashier-orders/{order.pk}/', {
+                'table_number': 2, 'total_amount': '20', 'received_amount': '20', 'status': 'paid',
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('mark_paid', response.data['detail'])
+
+        response = self.client.patch(f'/api/cashier-orders/{order.pk}/', {
+            'table_number': 2, 'paid_at': '2026-01-01T00:00:00Z', 'refunded_amount': '5',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual((order.table_number, order.status, order.paid_at), (2, 'cancelled', None))
+        self.assertEqual(order.refunded_amount, 0)
+        self.assertFalse(DailyCollection.objects.exists())
+
+    def test_rejects_unknown_status_and_bad_ids(self):
+        self.assertEqual(self.bulk([1], 'refunded').status_code, 400)
+        self.assertEqual(self.bulk([], 'paid').status_code, 400)
+        self.assertEqual(self.bulk(['x'], 'paid').status_code, 400)
+
+
+def paid_order(total=Decimal('100.00')):
+    order = Order.objects.create(
+        table_number=1, total_amount=total, received_amount=total, status='paid', paid_at=timezone.now(),
+    )
+    OrderItem.objects.create(order=order, food_id=1, name='Thali', quantity=1, price=total)
+    return order
+
+
+class RefundTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def refund(self, order, amount):
+        return self.client.post(f'/api/cashier-orders/{order.pk}/refund/', {'amount': amount}, format='json')
+
+    def test_rejects_non_finite_and_unpaid(self):
+        order = paid_order()
+        for amount in ('NaN', 'Infinity', '-Infinity', 'abc'):
+            self.assertEqual(self.refund(order, amount).status_code, 400, amount)
+
+        pending = Order.objects.create(table_number=2, total_amount=50, received_amount=0)
+        cancelled = Order.objects.create(table_number=3, total_amount=50, received_amount=0, status='cancelled')
+        for unpaid in (pending, cancelled):
+            response = self.refund(unpaid, '10')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Only paid orders', response.data['error'])
+        self.assertFalse(Refund.objects.exists())
+        self.assertFalse(DailyCollection.objects.filter(refunded_amount__gt=0).exists())
+
+    def test_over_refund_is_rejected_and_ledgers_agree(self):
+        order = paid_order()
+        self.assertEqual(self.refund(order, '60').status_code, 200)
+        over = self.refund(order, '50')
+        self.assertEqual(over.status_code, 400)
+        self.assertIn('Max refundable: ₹40.00', over.data['error'])
+        self.assertEqual(self.refund(order, '40').data['is_fully_refunded'], True)
+        self.assertIn('already fully refunded', self.refund(order, '1').data['error'])
+
+        order.refresh_from_db()
+        self.assertEqual(order.refunded_amount, Decimal('100.00'))
+        self.assertEqual(list(Refund.objects.order_by('amount').values_list('amount', flat=True)), [Decimal('40.00'), Decimal('60.00')])
+        self.assertEqual(DailyCollection.objects.aggregate(total=Sum('refunded_amount'))['total'], Decimal('100.00'))
+        self.assertEqual(ItemSalesHourly.objects.aggregate(total=Sum('refunded_amount'))['total'], Decimal('100.00'))
+
+
+class ConcurrentRefundTests(TransactionTestCase):
+    # Keep the rows data migrations seed (menu state, meal period rules)
+    serialized_rollback = True
+
+    def test_double_refund_applies_once(self):
+        order = paid_order()
+        barrier = threading.Barrier(2)
+
+        def refund(_):
+            try:
+                barrier.wait()
+                return APIClient().post(f'/api/cashier-orders/{order.pk}/refund/', {'amount': '60'}, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(2) as pool:
+            codes = sorted(pool.map(refund, range(2)))
+        self.assertEqual(codes, [200, 400])
+        order.refresh_from_db()
+        self.assertEqual(order.refunded_amount, Decimal('60.00'))
+        self.assertEqual(Refund.objects.count(), 1)
+        self.assertEqual(DailyCollection.objects.get().refunded_amount, Decimal('60.00'))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tea = FoodItem.objects.create(food_name='Tea', price=15)
+
+    def create(self, key, quantity=1):
+        return self.client.post('/api/cashier-orders/create_order/', {
+            'table_number': 1, 'cart': [{'food_id': self.tea.food_id, 'quantity': quantity}],
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.create('order-1')
+        retry = self.create('order-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        self.create('order-2')
+        self.assertEqual(self.create('order-2', quantity=2).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_action_leaves_no_claimed_key(self):
+        order = Order.objects.create(table_number=1, total_amount=10, received_amount=0)
+        url = f'/api/cashier-orders/{order.pk}/mark_paid/'
+        with patch('cashier.views.transition_orders', side_effect=RuntimeError("worker died")):
+            with self.assertRaises(RuntimeError):
+                self.client.post(url, HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retry)
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_concurrent_duplicates_run_once(self):
+        order = paid_order()
+        barrier = threading.Barrier(2)
+
+        def refund(_):
+            try:
+                barrier.wait()
+                response = APIClient().post(
+                    f'/api/cashier-orders/{order.pk}/refund/', {'amount': '60'},
+                    format='json', HTTP_IDEMPOTENCY_KEY='refund-1',
+                )
+                return response.status_code, response.get('Idempotent-Replayed')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(2) as pool:
+            results = sorted(pool.map(refund, range(2)), key=str)
+        self.assertEqual(results, [(200, 'true'), (200, None)])
+        self.assertEqual(Refund.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().response_status, 200)
@@ -0,0 +1,109 @@
+# backend/kot_project/cashier/transitions.py
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .events import ORDER_CANCELLED, ORDER_PAID, publish_order_event
+from .inventory import restore_portions
+from .models import Order
+from .rollups import record_transitions
+
+# target status -> statuses it may be reached from
+ALLOWED_TRANSITIONS = {
+    'paid': ('pending',),
+    'cancelled': ('pending', 'paid'),
+}
+
+TRANSITION_EVENTS = {
+    'paid': ORDER_PAID,
+    'cancelled': ORDER_CANCELLED,
+}
+
+ALREADY_MESSAGES = {
+    'paid': "Order already paid",
+    'cancelled': "Order already cancelled",
+}
+
+_RETURNED_FIELDS = (
+    'order_id', 'status', 'payment_mode', 'total_amount', 'refunded_amount',
+    'paid_at', 'table_number', 'waiter_id',
+)
+
+
+def _compare_and_set_sql(target):
+    """
+    One statement: lock the rows that are still in an allowed source status,
+    move them to `target` and return them together with their old status.
+    Rows whose status changed concurrently simply drop out of the CTE.
+    """
+    table = connection.ops.quote_name(Order._meta.db_table)
+    paid_at = "COALESCE(o.paid_at, %(now)s)" if target == 'paid' else "o.paid_at"
+    returned = ", ".join(f"o.{connection.ops.quote_name(field)}" for field in _RETURNED_FIELDS)
+    return f"""
+        WITH prev AS (
+            SELECT order_id, status FROM {table}
+            WHERE order_id = ANY(%(ids)s) AND status = ANY(%(sources)s)
+            FOR UPDATE
+        )
+        UPDATE {table} AS o
+        SET status = %(target)s, paid_at = {paid_at}, updated_at = %(now)s
+        FROM prev
+        WHERE o.order_id = prev.order_id
+        RETURNING {returned}, prev.status
+    """
+
+
+def transition_orders(order_ids, target):
+    """
+    Move orders to `target` status with a compare-and-set UPDATE.
+
+    Returns {order_id: (ok, detail)} where detail is the previous status on
+    success, or an error message ("Order not found", "Order already paid",
+    "Cannot change a cancelled order to paid", ...). The daily collection
+    rollup is adjusted, cancelled orders' portions are given back and events
+    are published in the same transaction.
+    """
+    sources = ALLOWED_TRANSITIONS[target]
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    if not order_ids:
+        return {}
+
+    now = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_compare_and_set_sql(target), {
+                'ids': order_ids,
+                'sources': list(sources),
+                'target': target,
+                'now': now,
+            })
+            changed = cursor.fetchall()
+
+        outcomes = {}
+        paid, unpaid = [], []
+        for row in changed:
+            previous = row[-1]
+            order = Order(**dict(zip(_RETURNED_FIELDS, row[:-1])))
+            if target == 'paid':
+                paid.append(order)
+            elif previous == 'paid':
+                unpaid.append(order)
+            publish_order_event(order, TRANSITION_EVENTS[target])
+            outcomes[order.order_id] = (True, previous)
+        record_transitions(paid=paid, cancelled=unpaid)
+        if target == 'cancelled':
+            restore_portions([row[0] for row in changed])
+
+        missing = [order_id for order_id in order_ids if order_id not in outcomes]
+        current = dict(
+            Order.objects.filter(order_id__in=missing).values_list('order_id', 'status')
+        ) if missing else {}
+        for order_id in missing:
+            if order_id not in current:
+                outcomes[order_id] = (False, "Order not found")
+            elif current[order_id] == target:
+                outcomes[order_id] = (False, ALREADY_MESSAGES[target])
+            else:
+                outcomes[order_id] = (False, f"Cannot change a {current[order_id]} order to {target}")
+
+    return {order_id: outcomes[order_id] for order_id in order_ids}
+
@@ -1,11 +1,12 @@
 # backend/cashier/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CashierOrderViewSet
+from .views import CashierOrderViewSet, order_events
 
 router = DefaultRouter()
 router.register(r'cashier-orders', CashierOrderViewSet)
 
 urlpatterns = [
+    path('order-events/', order_events, name='order-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
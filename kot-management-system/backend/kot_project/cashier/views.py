@@ -1,14 +1,49 @@
 # backend/kot_project/cashier/views.py
+import asyncio
+import json
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny 
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum, Q
-from datetime import date
-from .models import Order, OrderItem
+from django.utils.http import parse_etags
+from django.db import transaction
+from django.db.models import F
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from .models import DailyCollection, DeletedOrder, Order, OrderItem, Refund
 from .serializers import OrderSerializer
-from management.models import AdminUser
+from .pagination import OrderKeysetPagination
+from .idempotency import idempotent
+from .inventory import SoldOut, take_portions
+from .business_day import current_business_day, in_business_days
+from .reports import (
+    BUCKETS, TOP_ITEMS_ORDERING, TREND_BUCKETS, SpanTooLong, cached_sales_timeseries, check_span, default_range,
+    item_trend, top_items,
+)
+from .rollups import record_refund
+from .transitions import ALLOWED_TRANSITIONS, transition_orders
+from .sync import SYNC_OVERLAP, decode_sync_token, encode_sync_token, feed_etag, feed_state
+from .events import (
+    ORDER_CREATED, ORDER_REFUNDED, ROLE_EVENTS,
+    get_broker, publish_order_event,
+)
+from management.models import AdminUser, FoodItem, TableSeat
+from management.scheduler import fresh_menu_version
+
+
+# Largest value of the orders' DecimalField(max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def parse_amount(value):
+    """A finite money amount rounded to paise. Raises InvalidOperation otherwise."""
+    amount = Decimal(str(value))
+    if not amount.is_finite():
+        raise InvalidOperation(value)
+    return amount.quantize(Decimal('0.01'))
 
 
 class CashierOrderViewSet(viewsets.ModelViewSet):
@@ -18,24 +53,113 @@ class CashierOrderViewSet(viewsets.ModelViewSet):
     - Create new order (waiter → cashier)
     - Mark order as paid
     - Cancel order
+    - Settle or cancel many orders at once
     - Get today's collection summary
     - Refund order (partial or full)
+    - Refund report over a date range
+    - Sales time series (hour/day/week/month buckets)
+    - Top selling items and per-item sales trend
+
+    create_order, mark_paid, cancel_order and refund honour an
+    Idempotency-Key header so retried requests are not applied twice.
+
+    Listing is cursor-paginated when ?cursor= or ?page_size= is passed,
+    and returns only changes when ?since=<sync_token> is passed.
     """
-    queryset = Order.objects.prefetch_related('items').order_by('-created_at')
+    queryset = Order.objects.select_related('waiter').prefetch_related('items').order_by('-created_at', '-order_id')
     serializer_class = OrderSerializer
+    pagination_class = OrderKeysetPagination
     permission_classes = [AllowAny]  # Use IsAuthenticated in production
 
+    def get_queryset(self):
+        queryset = self._waiter_queryset()
+
+        # Optional server-side filters (?status=pending, ?waiter=<id>)
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(status=order_status)
+
+        return queryset
+
+    def _waiter_queryset(self):
+        queryset = super().get_queryset()
+        waiter = self.request.query_params.get('waiter')
+        if waiter:
+            try:
+                queryset = queryset.filter(waiter_id=int(waiter))
+            except ValueError:
+                pass
+        return queryset
+
+    def update(self, request, *args, **kwargs):
+        if 'status' in request.data:
+            return Response(
+                {"detail": "status can't be edited directly; use mark_paid, cancel_order or bulk_status"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().update(request, *args, **kwargs)
+
+    # ──────────────────────────────
+    # 0. LIST (full or delta) WITH ETAG
+    # ──────────────────────────────
+    def list(self, request, *args, **kwargs):
+        state = feed_state()
+        etag = feed_etag(state, request.META.get('QUERY_STRING', ''))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        since = request.query_params.get('since')
+        if since is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            try:
+                since_at = decode_sync_token(since)
+            except (ValueError, OverflowError):
+                return Response({"detail": "Invalid sync token"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Orders that left the list - cancelled, or moved out of ?status= -
+            # and deleted orders go out as tombstones so clients can drop them
+            after = since_at - SYNC_OVERLAP
+            order_status = request.query_params.get('status')
+            orders, tombstones = [], []
+            for order in self._waiter_queryset().filter(updated_at__gt=after):
+                left = (order.status != order_status) if order_status else (order.status == 'cancelled')
+                if left:
+                    tombstones.append({
+                        "order_id": order.order_id,
+                        "status": order.status,
+                        "updated_at": order.updated_at.isoformat(),
+                    })
+                else:
+                    orders.append(order)
+            for deleted in DeletedOrder.objects.filter(deleted_at__gt=after):
+                tombstones.append({
+                    "order_id": deleted.order_id,
+                    "status": "deleted",
+                    "updated_at": deleted.deleted_at.isoformat(),
+                })
+
+            response = Response({
+                "orders": self.get_serializer(orders, many=True).data,
+                "tombstones": tombstones,
+                "sync_token": encode_sync_token(state['last_change']),
+            })
+
+        response['ETag'] = etag
+        return response
+
     # ──────────────────────────────
     # 1. CREATE ORDER (Waiter → Cashier)
     # ──────────────────────────────
     # cashier/views.py - Update the create_order method
     # cashier/views.py
     @action(detail=False, methods=['post'], url_path='create_order')
+    @idempotent
     def create_order(self, request):
         data = request.data
         try:
             # Validate required fields
-            required = ['table_number', 'total_amount', 'cart']  # Updated field names
+            required = ['table_number', 'cart']  # total_amount is recomputed server-side
             missing = [field for field in required if field not in data]
             if missing:
                 return Response(
@@ -43,6 +167,8 @@ class CashierOrderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            table_number = int(data['table_number'])
+
             # Get waiter
             waiter_id = data.get('waiter')
             waiter = None
@@ -52,140 +178,208 @@ class CashierOrderViewSet(viewsets.ModelViewSet):
                 except AdminUser.DoesNotExist:
                     return Response({"detail": "Invalid waiter_id"}, status=400)
 
-            payment_mode = data.get('payment_mode', 'cash').lower()
+            payment_mode = (data.get('payment_mode') or 'cash').lower()
+            if payment_mode not in dict(Order.PAYMENT_MODE_CHOICES):
+                return Response({"detail": f"Invalid payment_mode '{payment_mode}'"}, status=400)
+
+            try:
+                received_amount = parse_amount(data.get('received_amount') or 0)
+            except (InvalidOperation, ValueError, TypeError):
+                return Response({"detail": f"Invalid received_amount: {data.get('received_amount')}"}, status=400)
+            if not 0 <= received_amount <= MAX_AMOUNT:
+                return Response({"detail": f"received_amount must be between 0 and {MAX_AMOUNT}"}, status=400)
 
             # Get seat information
             selected_seats = data.get('selected_seats', [])
             table_id = data.get('table_id')
 
-            # Create order
-            order = Order.objects.create(
-                table_number=int(data['table_number']),
-                table_id=table_id,
-                selected_seats=selected_seats,
-                total_amount=float(data['total_amount']),
-                payment_mode=payment_mode,
-                received_amount=float(data.get('received_amount', 0)),
-                status='pending',
-                waiter=waiter
-            )
-
-            # Create OrderItems - FIXED: Include food_id
             cart = data.get('cart', [])
-            if not isinstance(cart, list):
-                return Response({"detail": "cart must be a list"}, status=400)
-
-            order_items = []
-            for item in cart:
-                if not all(k in item for k in ['name', 'quantity', 'price']):
-                    return Response({"detail": "Invalid item in cart"}, status=400)
-                
-                order_items.append(
+            if not isinstance(cart, list) or not cart:
+                return Response({"detail": "cart must be a non-empty list"}, status=400)
+
+            lines, errors = self._validate_cart(cart)
+            if errors:
+                return Response({"detail": "Invalid items in cart", "errors": errors}, status=400)
+
+            total_amount = sum(
+                (line['food'].price * line['quantity'] for line in lines), Decimal('0')
+            ).quantize(Decimal('0.01'))
+
+            # Order, items and seat occupancy succeed or fail together
+            with transaction.atomic():
+                order = Order.objects.create(
+                    table_number=table_number,
+                    table_id=table_id,
+                    selected_seats=selected_seats,
+                    total_amount=total_amount,
+                    payment_mode=payment_mode,
+                    received_amount=received_amount,
+                    status='pending',
+                    waiter=waiter
+                )
+
+                OrderItem.objects.bulk_create([
                     OrderItem(
                         order=order,
-                        food_id=item.get('food_id'),  # Make sure this is included
-                        name=str(item['name']),
-                        quantity=int(item['quantity']),
-                        price=float(item['price'])
+                        food_id=line['food'].food_id,
+                        category=line['food'].category,
+                        name=line['food'].food_name,
+                        quantity=line['quantity'],
+                        price=line['food'].price,
                     )
-                )
-            
-            OrderItem.objects.bulk_create(order_items)
+                    for line in lines
+                ])
+
+                # Mark selected seats as occupied
+                if selected_seats:
+                    TableSeat.objects.filter(
+                        seat_number__in=selected_seats,
+                        table__table_number=str(table_number)
+                    ).update(is_available=False)
+
+                # Last, so counted items stay locked only until commit
+                take_portions(lines)
 
-            # Mark selected seats as occupied
-            if selected_seats:
-                from management.models import TableSeat
-                TableSeat.objects.filter(
-                    seat_number__in=selected_seats,
-                    table__table_number=data['table_number']
-                ).update(is_available=False)
+                publish_order_event(order, ORDER_CREATED)
 
             serializer = OrderSerializer(order)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+        except SoldOut as e:
+            errors = [
+                {"food_id": food.food_id, "error": f"Not enough {food.food_name} left"} for food in e.items
+            ]
+            return Response({"detail": "Invalid items in cart", "errors": errors}, status=status.HTTP_409_CONFLICT)
         except (ValueError, TypeError) as e:
             return Response({"detail": f"Invalid data type: {e}"}, status=400)
         except Exception as e:
             return Response({"detail": str(e)}, status=400)
 
+    def _validate_cart(self, cart):
+        """
+        Check every cart line against the menu with a single FoodItem query.
+        Returns (lines, errors); price and name always come from the menu.
+        """
+        errors = []
+        requested = []
+        for index, item in enumerate(cart):
+            if not isinstance(item, dict) or not item.get('food_id'):
+                errors.append({"index": index, "error": "food_id is required"})
+                continue
+            try:
+                food_id = int(item['food_id'])
+                quantity = int(item.get('quantity', 1))
+            except (ValueError, TypeError):
+                errors.append({"index": index, "error": "food_id and quantity must be integers"})
+                continue
+            if quantity < 1:
+                errors.append({"index": index, "food_id": food_id, "error": "quantity must be at least 1"})
+                continue
+            requested.append((index, food_id, quantity))
+
+        # Stock and the timing flag are on the row itself
+        fresh_menu_version()
+        menu = FoodItem.objects.in_bulk({food_id for _, food_id, _ in requested})
+
+        lines = []
+        for index, food_id, quantity in requested:
+            food = menu.get(food_id)
+            if food is None or not food.is_active:
+                errors.append({"index": index, "food_id": food_id, "error": "Food item not found"})
+            elif not food.is_available_now():
+                errors.append({"index": index, "food_id": food_id, "error": f"{food.food_name} is not available now"})
+            else:
+                lines.append({"food": food, "quantity": quantity})
+        errors.sort(key=lambda error: error['index'])
+        return lines, errors
+
     # ──────────────────────────────
     # 2. MARK AS PAID
     # ──────────────────────────────
     @action(detail=True, methods=['post'], url_path='mark_paid')
+    @idempotent
     def mark_paid(self, request, pk=None):
-        try:
-            order = self.get_object()
-            if order.status == 'paid':
-                return Response(
-                    {"detail": "Order already paid"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            order.status = 'paid'
-            order.paid_at = timezone.now()
-            order.save()
-
-            return Response(
-                {"message": "Order marked as paid", "order_id": order.order_id},
-                status=status.HTTP_200_OK
-            )
-        except Order.DoesNotExist:
-            return Response(
-                {"detail": "Order not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        return self._transition_one(pk, 'paid', "Order marked as paid")
 
     # ──────────────────────────────
     # 3. CANCEL ORDER
     # ──────────────────────────────
     @action(detail=True, methods=['post'], url_path='cancel_order')
+    @idempotent
     def cancel_order(self, request, pk=None):
-        try:
-            order = self.get_object()
-            if order.status == 'cancelled':
-                return Response(
-                    {"detail": "Order already cancelled"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        return self._transition_one(pk, 'cancelled', "Order cancelled successfully")
 
-            order.status = 'cancelled'
-            order.cancelled_at = timezone.now()
-            order.save()
+    def _transition_one(self, pk, target, message):
+        """Single compare-and-set UPDATE; no SELECT on the happy path."""
+        try:
+            order_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({"detail": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        ok, detail = transition_orders([order_id], target)[order_id]
+        if ok:
             return Response(
-                {"message": "Order cancelled successfully", "order_id": order.order_id},
+                {"message": message, "order_id": order_id},
                 status=status.HTTP_200_OK
             )
-        except Order.DoesNotExist:
+        if detail == "Order not found":
+            return Response({"detail": detail}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    # ──────────────────────────────
+    # 3b. BULK SETTLE / CANCEL
+    # ──────────────────────────────
+    @action(detail=False, methods=['post'], url_path='bulk_status')
+    @idempotent
+    def bulk_status(self, request):
+        """
+        POST /api/cashier-orders/bulk_status/
+        {"order_ids": [1, 2, 3], "status": "paid" | "cancelled"}
+
+        Applies the transition to every order in one statement and reports
+        the outcome per order id.
+        """
+        target = request.data.get('status')
+        if target not in ALLOWED_TRANSITIONS:
             return Response(
-                {"detail": "Order not found"},
-                status=status.HTTP_404_NOT_FOUND
+                {"detail": f"status must be one of: {', '.join(ALLOWED_TRANSITIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        order_ids = request.data.get('order_ids')
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response({"detail": "order_ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            outcomes = transition_orders(order_ids, target)
+        except (TypeError, ValueError):
+            return Response({"detail": "order_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        for order_id, (ok, detail) in outcomes.items():
+            if ok:
+                results.append({"order_id": order_id, "success": True, "status": target, "previous_status": detail})
+            else:
+                results.append({"order_id": order_id, "success": False, "error": detail})
+
+        return Response({
+            "updated_count": sum(1 for result in results if result["success"]),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
     # ──────────────────────────────
     # 4. TODAY'S COLLECTION SUMMARY
     # ──────────────────────────────
     @action(detail=False, methods=['get'], url_path='today_collection')
     def today_collection(self, request):
-        today = date.today()
-        paid_orders = Order.objects.filter(
-            status='paid',
-            paid_at__date=today
-        )
-
-        collection = paid_orders.aggregate(
-            total=Sum('total_amount'),
-            cash=Sum('total_amount', filter=Q(payment_mode='cash')),
-            card=Sum('total_amount', filter=Q(payment_mode='card')),
-            upi=Sum('total_amount', filter=Q(payment_mode='upi')),
-        )
+        # Read the maintained rollup (at most one row per payment mode)
+        rows = DailyCollection.objects.filter(business_day=current_business_day())
 
-        result = {
-            "total": float(collection['total'] or 0),
-            "cash": float(collection['cash'] or 0),
-            "card": float(collection['card'] or 0),
-            "upi": float(collection['upi'] or 0),
-        }
+        result = {"total": 0.0, "cash": 0.0, "card": 0.0, "upi": 0.0, "refunded": 0.0, "order_count": 0}
+        for row in rows:
+            result[row.payment_mode] = float(row.total_amount)
+            result["total"] += float(row.total_amount)
+            result["refunded"] += float(row.refunded_amount)
+            result["order_count"] += row.order_count
 
         return Response(result, status=status.HTTP_200_OK)
 
@@ -193,48 +387,287 @@ class CashierOrderViewSet(viewsets.ModelViewSet):
     # 5. REFUND ORDER (Partial or Full)
     # ──────────────────────────────
     @action(detail=True, methods=['post'], url_path='refund')
+    @idempotent
     def refund(self, request, pk=None):
         try:
-            order = self.get_object()
+            order_id = int(pk)
+            amount = parse_amount(request.data.get('amount', 0))
+        except (InvalidOperation, ValueError, TypeError):
+            return Response(
+                {"error": f"Invalid amount: {request.data.get('amount')}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Calculate remaining refundable amount
-            remaining = float(order.total_amount) - float(order.refunded_amount or 0)
-            amount = float(request.data.get('amount', 0))
+        if amount <= 0:
+            return Response(
+                {"error": "Refund amount must be greater than 0"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            if order.is_refunded and remaining <= 0:
-                return Response(
-                    {"error": "This order is already fully refunded"},
-                    status=status.HTTP_400_BAD_REQUEST
+        reason = request.data.get('reason', 'No reason provided')
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                # Guarded increment: only paid orders, and only while the refund still fits
+                updated = Order.objects.filter(
+                    order_id=order_id,
+                    status='paid',
+                    refunded_amount__lte=F('total_amount') - amount,
+                ).update(
+                    refunded_amount=F('refunded_amount') + amount,
+                    is_refunded=True,
+                    refund_reason=reason,
+                    refunded_at=now,
+                    updated_at=now,
                 )
+                if updated:
+                    Refund.objects.create(order_id=order_id, amount=amount, reason=reason, created_at=now)
 
-            if amount <= 0:
+                order = Order.objects.get(order_id=order_id)
+                if updated:
+                    record_refund(order, amount, now)
+                    publish_order_event(order, ORDER_REFUNDED)
+
+        except Order.DoesNotExist:
+            return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        remaining = order.total_amount - order.refunded_amount
+        if not updated:
+            if order.status != 'paid':
                 return Response(
-                    {"error": "Refund amount must be greater than 0"},
+                    {"error": f"Only paid orders can be refunded (order is {order.status})"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-
-            if amount > remaining:
+            if remaining <= 0:
                 return Response(
-                    {"error": f"Cannot refund ₹{amount}. Max refundable: ₹{remaining}"},
+                    {"error": "This order is already fully refunded"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            return Response(
+                {"error": f"Cannot refund ₹{amount}. Max refundable: ₹{remaining}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Process refund
-            order.refunded_amount = float(order.refunded_amount or 0) + amount
-            order.refund_reason = request.data.get('reason', 'No reason provided')
-            order.refunded_at = timezone.now()
-            order.save()
+        return Response({
+            "message": "Refund processed successfully",
+            "refunded_amount": float(order.refunded_amount),
+            "remaining_amount": float(remaining),
+            "is_fully_refunded": order.refunded_amount >= order.total_amount
+        }, status=status.HTTP_200_OK)
 
-            return Response({
-                "message": "Refund processed successfully",
-                "refunded_amount": float(order.refunded_amount),
-                "remaining_amount": float(order.total_amount) - float(order.refunded_amount),
-                "is_fully_refunded": order.refunded_amount >= order.total_amount
-            }, status=status.HTTP_200_OK)
+    # ──────────────────────────────
+    # 6. REFUND REPORT
+    # ──────────────────────────────
+    @action(detail=False, methods=['get'], url_path='refund_report')
+    def refund_report(self, request):
+        """
+        GET /api/cashier-orders/refund_report/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        Range scan over the refund ledger (both ends inclusive, business days).
+        """
+        try:
+            first, last = (
+                datetime.strptime(value, "%Y-%m-%d").date() if value else None
+                for value in (request.query_params.get('date_from'), request.query_params.get('date_to'))
+            )
+            refunds = in_business_days(Refund.objects.select_related('order'), 'created_at', first, last)
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Order.DoesNotExist:
-            return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-        except (ValueError, TypeError) as e:
-            return Response({"error": f"Invalid amount: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        entries = []
+        total = Decimal('0')
+        for refund in refunds.order_by('-created_at'):
+            total += refund.amount
+            entries.append({
+                "refund_id": refund.id,
+                "order_id": refund.order_id,
+                "amount": float(refund.amount),
+                "reason": refund.reason,
+                "payment_mode": refund.order.payment_mode,
+                "created_at": refund.created_at.isoformat(),
+            })
+
+        return Response({
+            "count": len(entries),
+            "total": float(total),
+            "refunds": entries,
+        }, status=status.HTTP_200_OK)
+
+    # ──────────────────────────────
+    # 7. SALES TIME SERIES
+    # ──────────────────────────────
+    @action(detail=False, methods=['get'], url_path='sales_report')
+    def sales_report(self, request):
+        """
+        GET /api/cashier-orders/sales_report/?bucket=day&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        Optional: payment_mode, waiter (id), status (default paid; "all" for every order).
+        Revenue, order count, average ticket and refunds per hour/day/week/month bucket.
+        """
+        params = request.query_params
+        bucket = params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return Response({"detail": "bucket must be one of hour, day, week, month"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            first, last = (
+                datetime.strptime(value, "%Y-%m-%d").date() if value else None
+                for value in (params.get('date_from'), params.get('date_to'))
+            )
+            waiter_id = int(params['waiter']) if params.get('waiter') else None
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD and waiter an id"}, status=status.HTTP_400_BAD_REQUEST)
+        first, last = default_range(bucket, first, last)
+        if first > last:
+            return Response({"detail": "date_from must not be after date_to"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            check_span(bucket, first, last)
+        except SpanTooLong as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        order_status = params.get('status', 'paid')
+        report = cached_sales_timeseries(
+            bucket, first, last,
+            payment_mode=params.get('payment_mode') or None,
+            waiter_id=waiter_id,
+            status=None if order_status == 'all' else order_status,
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+    # ──────────────────────────────
+    # 8. TOP SELLING ITEMS
+    # ──────────────────────────────
+    @action(detail=False, methods=['get'], url_path='top_items')
+    def top_items(self, request):
+        """
+        GET /api/cashier-orders/top_items/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&limit=10&by=quantity|revenue
+        Defaults to the last 30 business days. Read from the item sales rollup.
+        """
+        params = request.query_params
+        by = params.get('by', 'quantity')
+        if by not in TOP_ITEMS_ORDERING:
+            return Response({"detail": "by must be quantity or revenue"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            first, last = self._report_range(params, 'day')
+            limit = min(max(int(params.get('limit', 10)), 1), 100)
+        except SpanTooLong as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD and limit a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "date_from": first.isoformat(),
+            "date_to": last.isoformat(),
+            "items": top_items(first, last, limit=limit, by=by),
+        }, status=status.HTTP_200_OK)
+
+    # ──────────────────────────────
+    # 9. ITEM SALES TREND
+    # ──────────────────────────────
+    @action(detail=False, methods=['get'], url_path='item_trend')
+    def item_trend(self, request):
+        """
+        GET /api/cashier-orders/item_trend/?food_id=<id>&bucket=day|hour|hour_of_day&date_from=&date_to=
+        Quantity, revenue and refunds of one menu item over time.
+        """
+        params = request.query_params
+        bucket = params.get('bucket', 'day')
+        if bucket not in TREND_BUCKETS:
+            return Response({"detail": "bucket must be one of day, hour, hour_of_day"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            food_id = int(params['food_id'])
+            first, last = self._report_range(params, 'day', span_bucket=bucket)
+        except KeyError:
+            return Response({"detail": "food_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        except SpanTooLong as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD and food_id an id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "food_id": food_id,
+            "bucket": bucket,
+            "date_from": first.isoformat(),
+            "date_to": last.isoformat(),
+            "series": item_trend(food_id, first, last, bucket=bucket),
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _report_range(params, bucket, span_bucket=None):
+        """
+        date_from / date_to query params as business days, with `bucket`'s
+        defaults. Raises SpanTooLong past MAX_SPAN_DAYS of `span_bucket` (default `bucket`).
+        """
+        first, last = (
+            datetime.strptime(value, "%Y-%m-%d").date() if value else None
+            for value in (params.get('date_from'), params.get('date_to'))
+        )
+        first, last = default_range(bucket, first, last)
+        if first > last:
+            raise ValueError("date_from after date_to")
+        check_span(span_bucket or bucket, first, last)
+        return first, last
+
+
+# ──────────────────────────────
+# ORDER EVENT STREAM (Server-Sent Events)
+# ──────────────────────────────
+SSE_KEEPALIVE_SECONDS = 15
+
+
+async def order_events(request):
+    """
+    GET /api/order-events/ - Push order created/paid/cancelled/refunded events.
+
+    Optional filters:
+    - ?order_id=<id>              only that order (waiting screen)
+    - ?role=<admin|cashier|waiter> events relevant to that role
+    - ?waiter=<id>                with role=waiter, only that waiter's orders
+
+    Needs an ASGI server (see kot_project/asgi.py): the stream never ends,
+    and under WSGI Django would buffer it whole and hold a worker forever,
+    so WSGI requests get a 501. Across worker processes events travel
+    through ORDER_EVENTS_BROKER (PostgresBroker).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The order event stream needs the ASGI server; poll the ?since= feed instead"},
+            status=501,
+        )
+
+    try:
+        order_id = int(request.GET['order_id']) if request.GET.get('order_id') else None
+        waiter_id = int(request.GET['waiter']) if request.GET.get('waiter') else None
+    except ValueError:
+        return JsonResponse({"detail": "order_id and waiter must be integers"}, status=400)
+
+    role = request.GET.get('role') or None
+    if role is not None and role not in ROLE_EVENTS:
+        return JsonResponse({"detail": f"Unknown role '{role}'"}, status=400)
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        broker = get_broker()
+        # May wait for the broker's listener to connect - keep it off the event loop
+        subscription = await asyncio.to_thread(
+            broker.subscribe,
+            lambda event: loop.call_soon_threadsafe(queue.put_nowait, event),
+            order_id=order_id, role=role, waiter_id=waiter_id,
+        )
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,6 +3,9 @@ ASGI config for kot_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The /api/order-events/ server-sent events stream is an async view and must
+be served through this entry point, e.g. ``uvicorn kot_project.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'user',
@@ -66,6 +68,10 @@ ROOT_URLCONF = 'kot_project.urls'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    "idempotency-key",
+)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -73,6 +79,47 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Order list pagination (?cursor= / ?page_size=)
+ORDER_PAGE_SIZE = 50
+ORDER_MAX_PAGE_SIZE = 500
+
+# Pub/sub backend for /api/order-events/ (server-sent events). PostgresBroker
+# reaches every worker process via LISTEN/NOTIFY on ORDER_EVENTS_CHANNEL;
+# InProcessBroker only suits a single ASGI worker.
+ORDER_EVENTS_BROKER = 'cashier.events.PostgresBroker'
+ORDER_EVENTS_CHANNEL = 'order_events'
+
+# How long a stored Idempotency-Key response is replayed
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+
+# Business day used by order filters and reports: runs from the cutoff hour
+# to the same hour next day in this zone, so late bills count for the evening
+BUSINESS_DAY_TIME_ZONE = 'Asia/Kolkata'
+BUSINESS_DAY_CUTOFF_HOUR = 4
+
+# Cached menu snapshots (GET /api/food-menu/). Snapshots are kept in each
+# process's cache; the version they are keyed on is a database row, so every
+# process notices an edit on its next request.
+MENU_CACHE_SECONDS = 24 * 60 * 60
+
+# Longest the menu scheduler sleeps between timing boundaries; it also
+# notices edited timing windows on this interval
+MENU_SCHEDULER_POLL_SECONDS = 30
+
+# How long a sales report over already-closed business days is cached
+SALES_REPORT_CACHE_SECONDS = 5 * 60
+
+# Demand forecast: weeks of same-weekday history and per-week decay
+FORECAST_HISTORY_WEEKS = 52
+FORECAST_DECAY = 0.3
+
+# Order history export jobs (manage.py run_export_worker)
+EXPORT_ROOT = BASE_DIR / 'exports'
+EXPORT_FILE_TTL_SECONDS = 7 * 24 * 60 * 60
+EXPORT_WORKER_POLL_SECONDS = 2
+# A running job whose worker has not reported progress for this long is re-claimed
+EXPORT_CLAIM_TIMEOUT_SECONDS = 5 * 60
+
 
 AUTH_USER_MODEL = 'management.AdminUser'
 TEMPLATES = [
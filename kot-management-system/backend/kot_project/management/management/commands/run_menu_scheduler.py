@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from management.scheduler import MenuScheduler
+
+
+class Command(BaseCommand):
+    help = "Flip menu item availability at timing window boundaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Refresh availability flags and exit")
+
+    def handle(self, *args, **options):
+        scheduler = MenuScheduler()
+        flipped = scheduler.rebuild()
+        self.stdout.write(f"Menu scheduler: {flipped} items flipped, {len(scheduler.heap)} boundaries scheduled")
+        if options['once']:
+            return
+        try:
+            while True:
+                if scheduler.is_stale():
+                    scheduler.rebuild()
+                flipped = scheduler.run_due()
+                if flipped:
+                    self.stdout.write(f"{timezone.now():%H:%M:%S} {flipped} items flipped")
+
+                wait = settings.MENU_SCHEDULER_POLL_SECONDS
+                due = scheduler.next_due()
+                if due is not None:
+                    wait = min(wait, max((due - timezone.now()).total_seconds(), 0))
+                if wait:
+                    time.sleep(wait)
+                    # Drop connections the server timed out while we were idle
+                    close_old_connections()
+        except KeyboardInterrupt:
+            self.stdout.write("Menu scheduler stopped")
@@ -0,0 +1,108 @@
+# backend/management/menu_cache.py
+"""
+Pre-serialized menu for GET /api/food-menu/.
+
+A version counter is bumped (on commit) whenever a FoodItem or SubCategory
+is saved or deleted, and by the menu scheduler whenever a timing boundary
+flips items' is_in_window flag. The counter is a database row (MenuState)
+so every web worker and the scheduler see the same version; the rendered
+menu is cached per version in each process's own cache and the ETag is
+"menu-<version>", so unchanged menus get a 304. The stock dashboard
+summary is cached per version the same way.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from rest_framework.renderers import JSONRenderer
+
+
+def menu_version():
+    from .models import MenuState
+
+    version = MenuState.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        # Seed from the clock so a recreated database never reuses a version
+        # another process still has a snapshot cached for
+        version = MenuState.objects.get_or_create(pk=1, defaults={'version': time.time_ns() // 1000})[0].version
+    return version
+
+
+def bump_menu_version(windows_changed=False):
+    """
+    New menu version. `windows_changed` (a timing window was edited) also
+    makes the next menu read recompute is_in_window - see
+    scheduler.fresh_menu_version.
+    """
+    from .models import MenuState
+
+    changes = {'version': F('version') + 1}
+    if windows_changed:
+        changes['windows_valid_until'] = None
+    if not MenuState.objects.filter(pk=1).update(**changes):
+        menu_version()
+
+
+def bump_menu_version_on_commit(windows_changed=False):
+    transaction.on_commit(lambda: bump_menu_version(windows_changed))
+
+
+def menu_etag(version):
+    return '"menu-%s"' % version
+
+
+def menu_body(version):
+    """Rendered JSON of the full active menu for `version`, built once per version."""
+    from .models import FoodItem
+    from .serializers import FoodItemSerializer
+
+    body_key = 'menu:body:%s' % version
+    body = cache.get(body_key)
+    if body is None:
+        items = FoodItem.objects.filter(is_active=True).select_related('subcategory').order_by('category', 'food_name')
+        body = JSONRenderer().render(FoodItemSerializer(items, many=True).data)
+        cache.set(body_key, body, settings.MENU_CACHE_SECONDS)
+    return body
+
+
+def stock_summary(version):
+    """Stock counts overall and per subcategory for `version`, in one GROUP BY."""
+    from .models import FoodItem
+
+    summary_key = 'menu:stock_summary:%s' % version
+    summary = cache.get(summary_key)
+    if summary is not None:
+        return summary
+
+    groups = (
+        FoodItem.objects.filter(is_active=True)
+        .values('subcategory__subcategory_name')
+        .annotate(
+            total=Count('pk'),
+            in_stock=Count('pk', filter=Q(stock_status='in_stock')),
+            out_of_stock=Count('pk', filter=Q(stock_status='out_of_stock')),
+        )
+        .order_by()
+    )
+    total = in_stock = out_of_stock = 0
+    subcategory_stats = {}
+    for group in groups:
+        total += group['total']
+        in_stock += group['in_stock']
+        out_of_stock += group['out_of_stock']
+        name = group['subcategory__subcategory_name'] or 'Uncategorized'
+        stats = subcategory_stats.setdefault(name, {'total': 0, 'in_stock': 0})
+        stats['total'] += group['total']
+        stats['in_stock'] += group['in_stock']
+
+    summary = {
+        'total_items': total,
+        'in_stock_count': in_stock,
+        'out_of_stock_count': out_of_stock,
+        'availability_rate': round((in_stock / total) * 100, 2) if total > 0 else 0,
+        'subcategory_stats': subcategory_stats,
+    }
+    cache.set(summary_key, summary, settings.MENU_CACHE_SECONDS)
+    return summary
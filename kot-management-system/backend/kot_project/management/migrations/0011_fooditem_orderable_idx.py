@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0010_merge_20251120_1002'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooditem',
+            index=models.Index(condition=models.Q(('is_active', True), ('stock_status', 'in_stock')), fields=['category', 'food_name'], name='fooditem_orderable_idx'),
+        ),
+    ]
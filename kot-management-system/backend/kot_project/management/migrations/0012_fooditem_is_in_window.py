@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:54
+
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compute_flags(apps, schema_editor):
+    # Without this every existing item counts as in its window until the
+    # first refresh; subcategory is still a name at this point. Self-contained
+    # on purpose: later changes to the live window helpers must not alter it.
+    FoodItem = apps.get_model('management', 'FoodItem')
+    SubCategory = apps.get_model('management', 'SubCategory')
+    zone = ZoneInfo(getattr(settings, 'BUSINESS_DAY_TIME_ZONE', settings.TIME_ZONE))
+    at = timezone.now().astimezone(zone).time()
+
+    def is_open(row):
+        if not row.is_timing_active or not row.start_time or not row.end_time:
+            return True
+        # Inclusive; an end before the start runs past midnight
+        if row.start_time <= row.end_time:
+            return row.start_time <= at <= row.end_time
+        return at >= row.start_time or at <= row.end_time
+
+    closed = {subcategory.subcategory_name for subcategory in SubCategory.objects.all() if not is_open(subcategory)}
+    out_of_window = [item.pk for item in FoodItem.objects.all() if not is_open(item) or item.subcategory in closed]
+    FoodItem.objects.filter(pk__in=out_of_window).update(is_in_window=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0011_fooditem_orderable_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooditem',
+            name='is_in_window',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(compute_flags, migrations.RunPython.noop),
+    ]
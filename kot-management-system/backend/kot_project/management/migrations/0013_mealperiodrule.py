@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+# The rules apply_timing_stock used to hard-code
+DEFAULT_RULES = [
+    ('all', '', ''),
+    ('morning', 'tiffin', ''),
+    ('lunch', 'lunch', ''),
+    ('dinner', 'dinner', ''),
+    ('dinner', 'tiffin', 'idly'),
+    ('dinner', 'tiffin', 'dosa'),
+    ('dinner', 'tiffin', 'pongal'),
+    ('dinner', 'lunch', 'biryani'),
+    ('dinner', 'lunch', 'fried rice'),
+    ('dinner', 'lunch', 'noodles'),
+]
+
+
+def seed_rules(apps, schema_editor):
+    MealPeriodRule = apps.get_model('management', 'MealPeriodRule')
+    MealPeriodRule.objects.bulk_create([
+        MealPeriodRule(period=period, subcategory=subcategory, name_contains=name_contains)
+        for period, subcategory, name_contains in DEFAULT_RULES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0012_fooditem_is_in_window'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPeriodRule',
+            fields=[
+                ('rule_id', models.AutoField(primary_key=True, serialize=False)),
+                ('period', models.CharField(max_length=30)),
+                ('subcategory', models.CharField(blank=True, default='', max_length=100)),
+                ('name_contains', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'meal_period_rules',
+                'ordering': ['period', 'subcategory', 'name_contains'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'subcategory', 'name_contains'), name='unique_meal_period_rule')],
+            },
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
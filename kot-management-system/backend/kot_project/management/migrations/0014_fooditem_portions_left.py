@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0013_mealperiodrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooditem',
+            name='portions_left',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
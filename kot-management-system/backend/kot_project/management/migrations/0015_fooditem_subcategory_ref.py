@@ -0,0 +1,93 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def link_subcategories(apps, schema_editor):
+    # Point every item at the SubCategory of the same name, creating
+    # (untimed) subcategories for names that only existed on items
+    FoodItem = apps.get_model('management', 'FoodItem')
+    SubCategory = apps.get_model('management', 'SubCategory')
+    names = set(
+        FoodItem.objects.exclude(subcategory__isnull=True).exclude(subcategory='')
+        .values_list('subcategory', flat=True)
+    )
+    existing = set(SubCategory.objects.filter(subcategory_name__in=names).values_list('subcategory_name', flat=True))
+    SubCategory.objects.bulk_create([SubCategory(subcategory_name=name) for name in sorted(names - existing)])
+    FoodItem.objects.update(subcategory_ref=Subquery(
+        SubCategory.objects.filter(subcategory_name=OuterRef('subcategory')).values('pk')[:1]
+    ))
+
+
+def link_rules(apps, schema_editor):
+    # Rules only name a subcategory, so link them to an existing one (exact
+    # name first, then case-insensitively) and never add catalog rows for
+    # them. A rule with no match can't keep its meaning - unlinked it would
+    # match every subcategory - so it is deleted, and so is a rule that
+    # duplicates another once linked.
+    MealPeriodRule = apps.get_model('management', 'MealPeriodRule')
+    SubCategory = apps.get_model('management', 'SubCategory')
+    exact, folded = {}, {}
+    for pk, name in SubCategory.objects.order_by('pk').values_list('pk', 'subcategory_name'):
+        exact[name] = pk
+        folded.setdefault(name.casefold(), pk)
+
+    seen, unmatched, duplicates = set(), [], []
+    for rule in MealPeriodRule.objects.order_by('rule_id'):
+        target = None
+        if rule.subcategory:
+            target = exact.get(rule.subcategory) or folded.get(rule.subcategory.casefold())
+            if target is None:
+                unmatched.append(rule)
+                continue
+        key = (rule.period, target, rule.name_contains)
+        if key in seen:
+            duplicates.append(rule)
+            continue
+        seen.add(key)
+        if target is not None:
+            rule.subcategory_ref_id = target
+            rule.save(update_fields=['subcategory_ref'])
+
+    if unmatched:
+        print("\n  Deleted meal period rules naming a subcategory that does not exist: " + ", ".join(
+            f"{rule.period}/{rule.subcategory}/{rule.name_contains or '*'}" for rule in unmatched
+        ))
+    MealPeriodRule.objects.filter(pk__in=[rule.pk for rule in unmatched + duplicates]).delete()
+
+
+def copy_names_back(apps, schema_editor):
+    SubCategory = apps.get_model('management', 'SubCategory')
+    name = Subquery(SubCategory.objects.filter(pk=OuterRef('subcategory_ref')).values('subcategory_name')[:1])
+    apps.get_model('management', 'FoodItem').objects.update(subcategory=name)
+
+
+def copy_rule_names_back(apps, schema_editor):
+    SubCategory = apps.get_model('management', 'SubCategory')
+    name = Subquery(SubCategory.objects.filter(pk=OuterRef('subcategory_ref')).values('subcategory_name')[:1])
+    apps.get_model('management', 'MealPeriodRule').objects.update(subcategory=Coalesce(name, Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0014_fooditem_portions_left'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooditem',
+            name='subcategory_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='food_items', to='management.subcategory'),
+        ),
+        migrations.AddField(
+            model_name='mealperiodrule',
+            name='subcategory_ref',
+            field=models.ForeignKey(blank=True, help_text='Blank = any subcategory', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='meal_period_rules', to='management.subcategory'),
+        ),
+        migrations.RunPython(link_subcategories, copy_names_back),
+        migrations.RunPython(link_rules, copy_rule_names_back),
+    ]
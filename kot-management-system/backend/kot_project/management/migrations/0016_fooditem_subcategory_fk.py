@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0015: Postgres won't ALTER a table with pending deferred
+    # foreign key checks from the data migration in the same transaction
+
+    dependencies = [
+        ('management', '0015_fooditem_subcategory_ref'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='fooditem',
+            name='subcategory',
+        ),
+        migrations.RenameField(
+            model_name='fooditem',
+            old_name='subcategory_ref',
+            new_name='subcategory',
+        ),
+        migrations.RemoveConstraint(
+            model_name='mealperiodrule',
+            name='unique_meal_period_rule',
+        ),
+        migrations.RemoveField(
+            model_name='mealperiodrule',
+            name='subcategory',
+        ),
+        migrations.RenameField(
+            model_name='mealperiodrule',
+            old_name='subcategory_ref',
+            new_name='subcategory',
+        ),
+        migrations.AddConstraint(
+            model_name='mealperiodrule',
+            constraint=models.UniqueConstraint(fields=('period', 'subcategory', 'name_contains'), name='unique_meal_period_rule', nulls_distinct=False),
+        ),
+    ]
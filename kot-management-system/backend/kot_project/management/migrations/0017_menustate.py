@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:07
+
+import time
+
+from django.db import migrations, models
+
+
+def create_state(apps, schema_editor):
+    MenuState = apps.get_model('management', 'MenuState')
+    MenuState.objects.create(pk=1, version=time.time_ns() // 1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0016_fooditem_subcategory_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'menu_state',
+            },
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0017_menustate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menustate',
+            name='windows_valid_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,12 @@
 # backend/management/models.py
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 from datetime import timedelta
 from cloudinary.models import CloudinaryField
+from cashier.business_day import local_time_now
+from .menu_cache import bump_menu_version_on_commit
 
 class AdminUser(AbstractUser):
     ROLE_CHOICES = (
@@ -40,6 +43,84 @@ class EmailOTP(models.Model):
         return f"OTP for {self.email}"
 
 
+def window_open(start, end, at):
+    """Inclusive start-end window; an end before the start runs past midnight."""
+    if start <= end:
+        return start <= at <= end
+    return at >= start or at <= end
+
+
+def window_open_q(at, prefix=''):
+    """window_open() as a SQL predicate on start_time / end_time (of a related model with `prefix`)."""
+    start, end = f'{prefix}start_time', f'{prefix}end_time'
+    same_day = Q(**{f'{start}__lte': F(end)}) & Q(**{f'{start}__lte': at, f'{end}__gte': at})
+    overnight = Q(**{f'{start}__gt': F(end)}) & (Q(**{f'{start}__lte': at}) | Q(**{f'{end}__gte': at}))
+    return same_day | overnight
+
+
+def timing_allows_q(at, prefix=''):
+    """No active timing window, or the window is open at `at`."""
+    return (
+        Q(**{f'{prefix}is_timing_active': False}) | Q(**{f'{prefix}start_time__isnull': True})
+        | Q(**{f'{prefix}end_time__isnull': True}) | window_open_q(at, prefix)
+    )
+
+
+class FoodItemQuerySet(models.QuerySet):
+    def _in_window_q(self, at):
+        # The subcategory's window is read through the foreign key join
+        return timing_allows_q(at) & (Q(subcategory__isnull=True) | timing_allows_q(at, 'subcategory__'))
+
+    def available(self, at=None):
+        """
+        Active, in-stock items inside their own and their subcategory's
+        timing window. Without `at` this reads the is_in_window flag kept
+        current by the menu scheduler; with a local time `at` the windows
+        are evaluated in SQL. Windows whose end is before the start run
+        past midnight.
+        """
+        qs = self.filter(is_active=True, stock_status='in_stock')
+        if at is None:
+            return qs.filter(is_in_window=True)
+        return qs.filter(self._in_window_q(at))
+
+    def refresh_windows(self, at=None):
+        """
+        Set is_in_window for local time `at` (default now) in one UPDATE that
+        only touches rows whose flag flips. Returns the number flipped.
+        """
+        at = at or local_time_now()
+        expected = self._in_window_q(at)
+        return self.filter(
+            (Q(is_in_window=True) & ~expected) | (Q(is_in_window=False) & expected)
+        ).update(is_in_window=Case(When(is_in_window=True, then=Value(False)), default=Value(True)))
+
+    def apply_meal_period(self, period):
+        """
+        Put auto-managed items matching `period`'s MealPeriodRules in stock
+        and the rest out of stock: one UPDATE per direction, touching only
+        rows that change, in one transaction. Returns (stocked_ids,
+        unstocked_ids), or None if the period has no rules.
+        """
+        match = MealPeriodRule.match_q(period)
+        if match is None:
+            return None
+
+        managed = self.filter(auto_manage_stock=True, is_active=True)
+        now = timezone.now()
+        flipped = []
+        with transaction.atomic():
+            for target, rows in (('in_stock', managed.filter(match)), ('out_of_stock', managed.exclude(match))):
+                ids = list(rows.exclude(stock_status=target).select_for_update(of=('self',)).values_list('pk', flat=True))
+                if ids:
+                    FoodItem.objects.filter(pk__in=ids).update(
+                        stock_status=target, last_stock_update=now, updated_at=now,
+                    )
+                    bump_menu_version_on_commit()
+                flipped.append(sorted(ids))
+        return tuple(flipped)
+
+
 class FoodItem(models.Model):
     FOOD_CATEGORY_CHOICES = [
         ('food', 'Food'),
@@ -59,7 +140,9 @@ class FoodItem(models.Model):
 
     food_id = models.AutoField(primary_key=True)
     category = models.CharField(max_length=10, choices=FOOD_CATEGORY_CHOICES, default='food')
-    subcategory = models.CharField(max_length=100, blank=True, null=True)
+    subcategory = models.ForeignKey(
+        'SubCategory', on_delete=models.PROTECT, null=True, blank=True, related_name='food_items',
+    )
     food_type = models.CharField(max_length=10, choices=FOOD_TYPE_CHOICES, default='veg')
     food_name = models.CharField(max_length=100, unique=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -75,19 +158,51 @@ class FoodItem(models.Model):
     auto_manage_stock = models.BooleanField(default=True)
     stock_notes = models.TextField(blank=True, null=True)
     last_stock_update = models.DateTimeField(auto_now=True)
+    # Portions the kitchen has left; NULL = not counted. Orders decrement it
+    # (see cashier.inventory) and the item goes out of stock at zero.
+    portions_left = models.PositiveIntegerField(null=True, blank=True)
 
     # Custom timing fields
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
     is_timing_active = models.BooleanField(default=False)
 
+    # Item and subcategory timing windows both open; kept current by
+    # `manage.py run_menu_scheduler` so menu reads need no time logic
+    is_in_window = models.BooleanField(default=True)
+
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = FoodItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # available_items / order validation: orderable menu in display order
+            models.Index(
+                fields=['category', 'food_name'],
+                name='fooditem_orderable_idx',
+                condition=Q(is_active=True, stock_status='in_stock'),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.food_name} - ₹{self.price}"
 
+    def save(self, *args, **kwargs):
+        # Timing may have changed; don't wait for the scheduler's next boundary
+        self.is_in_window = self.windows_open_at(local_time_now())
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'is_in_window'}
+        super().save(*args, **kwargs)
+        bump_menu_version_on_commit(windows_changed=True)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_menu_version_on_commit(windows_changed=True)
+        return result
+
     @property
     def timing_display(self):
         if self.start_time and self.end_time:
@@ -99,36 +214,30 @@ class FoodItem(models.Model):
         """Check if timing is configured"""
         return bool(self.start_time and self.end_time)
 
+    def windows_open_at(self, at):
+        """Whether this item's and its subcategory's timing windows are open at local time `at`"""
+        if self.is_timing_active and self.has_timing and not window_open(self.start_time, self.end_time, at):
+            return False
+        return self.subcategory_id is None or self.subcategory.is_available_at(at)
+
     def is_available_now(self):
         """
-        Check if food item is available based on timing and stock
+        Check if food item is available based on stock and the timing
+        window flag maintained by the menu scheduler
         """
-        from django.utils import timezone
-        from datetime import datetime
-        
-        # Check stock status first
-        if self.stock_status == 'out_of_stock':
-            return False
-            
-        # If timing is not active or no timing set, always available
-        if not self.is_timing_active or not self.start_time or not self.end_time:
-            return True
-            
-        current_time = datetime.now().time()
-        
-        # Check if current time is within timing
-        return self.start_time <= current_time <= self.end_time
+        return self.stock_status != 'out_of_stock' and self.is_in_window
 
     @property
     def availability_status(self):
         """Get detailed availability status"""
         if self.stock_status == 'out_of_stock':
             return "Out of Stock"
-        
+
+        available = self.is_available_now()
         if not self.is_timing_active or not self.has_timing:
-            return "Available"
-        
-        if self.is_available_now():
+            return "Available" if available else "Not available now"
+
+        if available:
             return "Available Now"
         else:
             return f"Available from {self.start_time} to {self.end_time}" 
@@ -274,6 +383,17 @@ class SubCategory(models.Model):
     def __str__(self):
         return self.subcategory_name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.food_items.refresh_windows()
+        bump_menu_version_on_commit(windows_changed=True)
+
+    def delete(self, *args, **kwargs):
+        # Food items PROTECT their subcategory, so none are left to refresh
+        result = super().delete(*args, **kwargs)
+        bump_menu_version_on_commit(windows_changed=True)
+        return result
+
     @property
     def timing_display(self):
         if self.start_time and self.end_time:
@@ -282,21 +402,82 @@ class SubCategory(models.Model):
     
     def is_available_now(self):
         """
-        Check if this subcategory is available based on current time
+        Check if this subcategory is available based on current local time
         """
-        from django.utils import timezone
-        from datetime import datetime
-        
+        return self.is_available_at(local_time_now())
+
+    def is_available_at(self, at):
         # If timing is not active or no timing set, always available
         if not self.is_timing_active or not self.start_time or not self.end_time:
             return True
-            
-        current_time = datetime.now().time()
-        
-        # Check if current time is within timing
-        return self.start_time <= current_time <= self.end_time
+
+        return window_open(self.start_time, self.end_time, at)
 
     @property
     def has_timing(self):
         """Check if timing is configured"""
-        return bool(self.start_time and self.end_time)
\ No newline at end of file
+        return bool(self.start_time and self.end_time)
+
+
+class MealPeriodRule(models.Model):
+    """
+    Which auto-managed items a meal period keeps in stock, for
+    apply_timing_stock. An item matches a period when any of its rules
+    matches: same subcategory (blank = any) and a name containing
+    `name_contains` (blank = any, case-insensitive).
+    """
+    rule_id = models.AutoField(primary_key=True)
+    period = models.CharField(max_length=30)
+    subcategory = models.ForeignKey(
+        SubCategory,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='meal_period_rules',
+        help_text="Blank = any subcategory"
+    )
+    name_contains = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'meal_period_rules'
+        ordering = ['period', 'subcategory', 'name_contains']
+        constraints = [
+            # NULLs not distinct: one "any subcategory" rule per period and name, too
+            models.UniqueConstraint(
+                fields=['period', 'subcategory', 'name_contains'], name='unique_meal_period_rule',
+                nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period}: {self.subcategory or '*'} / {self.name_contains or '*'}"
+
+    @classmethod
+    def match_q(cls, period):
+        """OR of the period's rules as a FoodItem filter, or None for an unknown period."""
+        rules = cls.objects.filter(period=period).values_list('subcategory_id', 'name_contains')
+        match = None
+        for subcategory_id, name_contains in rules:
+            rule = Q(pk__isnull=False)
+            if subcategory_id is not None:
+                rule &= Q(subcategory_id=subcategory_id)
+            if name_contains:
+                rule &= Q(food_name__icontains=name_contains)
+            match = rule if match is None else match | rule
+        return match
+
+
+class MenuState(models.Model):
+    """
+    Single row (pk=1) holding the menu version. It lives in the database
+    rather than the per-process cache so that a bump from any web worker or
+    from the menu scheduler is seen by all of them.
+    """
+    version = models.BigIntegerField(default=0)
+    # is_in_window flags are correct until this moment (the next timing
+    # boundary); NULL = recompute on the next menu read
+    windows_valid_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'menu_state'
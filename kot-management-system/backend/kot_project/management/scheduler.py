@@ -0,0 +1,148 @@
+# backend/management/scheduler.py
+"""
+Menu timing scheduler.
+
+Every active timing window on a FoodItem or SubCategory has two boundaries
+a day: its start, and just after its (inclusive) end. The scheduler keeps
+the next occurrence of each boundary in a min-heap; when the earliest one
+is due it pops every due entry, flips the affected items' is_in_window flag
+in one UPDATE and bumps the menu version. Run it with
+`manage.py run_menu_scheduler`.
+
+Web processes don't depend on it: fresh_menu_version() records in MenuState
+until when the flags are valid (the next boundary), and the first menu read
+or order after that recomputes them itself.
+"""
+import heapq
+import itertools
+import time
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from cashier.business_day import business_timezone
+
+from .menu_cache import bump_menu_version
+from .models import FoodItem, MenuState, SubCategory
+
+TIMED = {'is_timing_active': True, 'start_time__isnull': False, 'end_time__isnull': False}
+
+
+def _after(moment):
+    """Time of day just after `moment` - windows are open through their end."""
+    return (datetime.combine(date.min, moment) + timedelta(microseconds=1)).time()
+
+
+def next_occurrence(at, now):
+    """First aware datetime strictly after `now` whose local time of day is `at`."""
+    local = now.astimezone(business_timezone())
+    candidate = datetime.combine(local.date(), at, tzinfo=local.tzinfo)
+    if candidate <= local:
+        candidate = datetime.combine(local.date() + timedelta(days=1), at, tzinfo=local.tzinfo)
+    return candidate
+
+
+def timing_windows():
+    """(start, end) of every active item and subcategory timing window."""
+    return [
+        *FoodItem.objects.filter(is_active=True, **TIMED).values_list('start_time', 'end_time'),
+        *SubCategory.objects.filter(**TIMED).values_list('start_time', 'end_time'),
+    ]
+
+
+def next_boundary(now):
+    """Earliest moment after `now` at which some item's is_in_window can flip, or None."""
+    return min(
+        (next_occurrence(at, now) for start, end in timing_windows() for at in (start, _after(end))),
+        default=None,
+    )
+
+
+def fresh_menu_version(now=None):
+    """
+    Current menu version, first bringing is_in_window up to date if a timing
+    boundary has passed (or a window was edited) since the last refresh -
+    one UPDATE of the rows that flip, serialized on the MenuState row. Call
+    before reading the flag so correctness never depends on the scheduler.
+    """
+    now = now or timezone.now()
+    state = MenuState.objects.filter(pk=1).values_list('version', 'windows_valid_until').first()
+    if state is not None and state[1] is not None and now < state[1]:
+        return state[0]
+
+    with transaction.atomic():
+        state, _ = MenuState.objects.select_for_update().get_or_create(
+            pk=1, defaults={'version': time.time_ns() // 1000},
+        )
+        if state.windows_valid_until is None or now >= state.windows_valid_until:
+            if FoodItem.objects.refresh_windows(now.astimezone(business_timezone()).time()):
+                state.version += 1
+            # Re-check at least daily, even with no timed windows
+            latest = now + timedelta(days=1)
+            state.windows_valid_until = min(next_boundary(now) or latest, latest)
+            state.save()
+    return state.version
+
+
+def menu_signature():
+    """Changes whenever a timing window may have been added, edited or removed."""
+    return (
+        FoodItem.objects.aggregate(count=Count('pk'), changed=Max('updated_at')),
+        SubCategory.objects.aggregate(count=Count('pk'), changed=Max('updated_at')),
+    )
+
+
+class MenuScheduler:
+    def __init__(self):
+        self.heap = []
+        self.signature = None
+        self._sequence = itertools.count()
+
+    def _push(self, moment, kind, key, at):
+        heapq.heappush(self.heap, (moment, next(self._sequence), kind, key, at))
+
+    def rebuild(self, now=None):
+        """Bring every flag up to date and reschedule all boundaries. Returns the number flipped."""
+        now = now or timezone.now()
+        self.signature = menu_signature()
+        flipped = FoodItem.objects.refresh_windows(now.astimezone(business_timezone()).time())
+
+        self.heap = []
+        windows = [
+            *(('item', key, start, end) for key, start, end in
+              FoodItem.objects.filter(is_active=True, **TIMED).values_list('pk', 'start_time', 'end_time')),
+            *(('subcategory', key, start, end) for key, start, end in
+              SubCategory.objects.filter(**TIMED).values_list('pk', 'start_time', 'end_time')),
+        ]
+        for kind, key, start, end in windows:
+            for at in {start, _after(end)}:
+                self._push(next_occurrence(at, now), kind, key, at)
+        if flipped:
+            bump_menu_version()
+        return flipped
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self, now=None):
+        """Apply every boundary due by `now` in one UPDATE. Returns the number of items flipped."""
+        now = now or timezone.now()
+        items, subcategories = set(), set()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, kind, key, at = heapq.heappop(self.heap)
+            (items if kind == 'item' else subcategories).add(key)
+            self._push(next_occurrence(at, now), kind, key, at)
+        if not items and not subcategories:
+            return 0
+
+        flipped = FoodItem.objects.filter(
+            Q(pk__in=items) | Q(subcategory__in=subcategories)
+        ).refresh_windows(now.astimezone(business_timezone()).time())
+        if flipped:
+            bump_menu_version()
+        return flipped
+
+    def is_stale(self):
+        return self.signature != menu_signature()
@@ -18,7 +18,11 @@ class SubCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['subcategory_id', 'created_at', 'updated_at']
 
 class FoodItemSerializer(serializers.ModelSerializer):
-    subcategory_display = serializers.CharField(source='subcategory', read_only=True)
+    # Read and written by name, as when subcategory was a plain string
+    subcategory = serializers.SlugRelatedField(
+        slug_field='subcategory_name', queryset=SubCategory.objects.all(), allow_null=True, required=False,
+    )
+    subcategory_display = serializers.CharField(source='subcategory.subcategory_name', read_only=True, default=None)
     timing_display = serializers.ReadOnlyField()
     has_timing = serializers.ReadOnlyField()
     is_available_now = serializers.ReadOnlyField()
@@ -29,7 +33,7 @@ class FoodItemSerializer(serializers.ModelSerializer):
         fields = [
             'food_id', 'category', 'subcategory', 'subcategory_display',
             'food_type', 'food_name', 'price', 'description', 'image',
-            'stock_status', 'auto_manage_stock', 'stock_notes', 'last_stock_update',
+            'stock_status', 'auto_manage_stock', 'stock_notes', 'last_stock_update', 'portions_left',
             'start_time', 'end_time', 'is_timing_active',
             'timing_display', 'has_timing', 'is_available_now', 'availability_status',
             'is_active', 'created_at', 'updated_at'
@@ -1,3 +1,307 @@
+import json
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from cashier.business_day import business_timezone
+
+from .menu_cache import bump_menu_version, menu_version
+from .models import FoodItem, MealPeriodRule, MenuState, SubCategory
+from .scheduler import MenuScheduler, fresh_menu_version
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        tiffin = SubCategory.objects.create(subcategory_name='tiffin')
+        self.dosa = FoodItem.objects.create(food_name='Masala Dosa', price=60, subcategory=tiffin)
+        FoodItem.objects.create(food_name='Old Item', price=10, is_active=False)
+
+    def test_repeat_fetch_is_not_modified_and_served_from_cache(self):
+        first = self.client.get('/api/food-menu/')
+        self.assertEqual(first.status_code, 200)
+        menu = json.loads(first.content)
+        self.assertEqual([(item['food_name'], item['subcategory']) for item in menu], [('Masala Dosa', 'tiffin')])
+
+        # Only the shared version row is read; the body comes from the cache
+        with self.assertNumQueries(2):
+            again = self.client.get('/api/food-menu/', HTTP_IF_NONE_MATCH=first['ETag'])
+            cold = self.client.get('/api/food-menu/')
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(cold.content, first.content)
+
+    def test_saving_menu_data_changes_the_etag(self):
+        etag = self.client.get('/api/food-menu/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dosa.price = 65
+            self.dosa.save()
+        response = self.client.get('/api/food-menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)[0]['price'], '65.00')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            SubCategory.objects.create(subcategory_name='lunch')
+        self.assertNotEqual(self.client.get('/api/food-menu/')['ETag'], etag)
+
+    def test_bump_from_another_process_is_seen(self):
+        etag = self.client.get('/api/food-menu/')['ETag']
+        # The scheduler or another worker has its own, separate cache
+        with mock.patch('management.menu_cache.cache', LocMemCache('other-process', {})):
+            bump_menu_version()
+        response = self.client.get('/api/food-menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_filtered_list_bypasses_snapshot(self):
+        response = self.client.get('/api/food-menu/', {'subcategory': 'lunch'})
+        self.assertEqual(response.data, [])
+
+    def test_subcategory_is_written_and_read_by_name(self):
+        lunch = SubCategory.objects.create(subcategory_name='lunch')
+        created = self.client.post('/api/food-menu/', {'food_name': 'Meals', 'price': '100', 'subcategory': 'lunch'}, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual((created.data['subcategory'], created.data['subcategory_display']), ('lunch', 'lunch'))
+        self.assertEqual(FoodItem.objects.get(food_name='Meals').subcategory, lunch)
+        self.assertEqual(
+            self.client.post('/api/food-menu/', {'food_name': 'Soup', 'price': '50', 'subcategory': 'soups'}, format='json').status_code,
+            400,
+        )
+
+        self.assertEqual(self.client.get('/api/food-menu/', {'subcategory': 'lunch'}).data[0]['food_name'], 'Meals')
+        self.assertEqual(self.client.get('/api/food-menu/subcategories/').data, ['lunch', 'tiffin'])
+        self.assertEqual(self.client.delete(f'/api/subcategories/{lunch.pk}/').status_code, 400)
+        SubCategory.objects.create(subcategory_name='unused')
+        self.assertEqual([row['subcategory_name'] for row in self.client.get('/api/subcategories/available/').data], ['unused'])
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        tiffin = SubCategory.objects.create(subcategory_name='tiffin', start_time=time(6), end_time=time(11), is_timing_active=True)
+        late = SubCategory.objects.create(subcategory_name='late', start_time=time(22), end_time=time(2), is_timing_active=True)
+        self.idli = FoodItem.objects.create(food_name='Idli', price=30, subcategory=tiffin)
+        self.parotta = FoodItem.objects.create(food_name='Parotta', price=40, subcategory=late)
+        self.tea = FoodItem.objects.create(
+            food_name='Tea', price=15, start_time=time(23), end_time=time(7), is_timing_active=True,
+        )
+        self.juice = FoodItem.objects.create(food_name='Juice', price=50, stock_status='out_of_stock')
+
+    def available(self, at):
+        return set(FoodItem.objects.available(at).values_list('food_name', flat=True))
+
+    def test_subcategory_and_overnight_windows(self):
+        self.assertEqual(self.available(time(6, 30)), {'Idli', 'Tea'})
+        self.assertEqual(self.available(time(23, 30)), {'Parotta', 'Tea'})
+        self.assertEqual(self.available(time(1, 0)), {'Parotta', 'Tea'})
+        self.assertEqual(self.available(time(15, 0)), set())
+
+    def flags_at(self, at):
+        FoodItem.objects.refresh_windows(at)
+        return set(FoodItem.objects.available().values_list('food_name', flat=True))
+
+    def test_refresh_windows_flips_only_changed_rows_and_matches_sql(self):
+        FoodItem.objects.refresh_windows(time(15, 0))
+        self.assertEqual(FoodItem.objects.refresh_windows(time(15, 30)), 0)
+        self.assertEqual(FoodItem.objects.refresh_windows(time(23, 30)), 2)
+        for hour in range(24):
+            at = time(hour, 30)
+            self.assertEqual(self.flags_at(at), self.available(at), at)
+
+    def test_save_sets_flag_from_current_windows(self):
+        with mock.patch('management.models.local_time_now', return_value=time(15, 0)):
+            self.idli.save()
+            self.tea.save(update_fields=['price'])
+        self.idli.refresh_from_db()
+        self.tea.refresh_from_db()
+        self.assertFalse(self.idli.is_in_window)
+        self.assertFalse(self.tea.is_in_window)
+
+    def test_available_items_endpoint_and_order_validation(self):
+        # No scheduler running: the first read past a boundary refreshes the flags
+        night = datetime(2026, 3, 2, 23, 30, tzinfo=business_timezone())
+        with mock.patch('django.utils.timezone.now', return_value=night):
+            APIClient().get('/api/food-menu/available_items/')
+            with self.assertNumQueries(2):  # menu state, items
+                response = APIClient().get('/api/food-menu/available_items/')
+            order = APIClient().post('/api/cashier-orders/create_order/', {
+                'table_number': 1, 'cart': [{'food_id': self.idli.food_id, 'quantity': 1}],
+            }, format='json')
+        self.assertEqual([item['food_name'] for item in response.data], ['Parotta', 'Tea'])
+        self.assertTrue(all(item['is_available_now'] for item in response.data))
+        self.assertEqual(order.status_code, 400)
+        self.assertEqual(order.data['errors'][0]['error'], 'Idli is not available now')
+
+    def test_stale_flags_are_recomputed_without_scheduler(self):
+        morning = datetime(2026, 3, 2, 6, 30, tzinfo=business_timezone())
+        version = fresh_menu_version(morning)
+        self.assertEqual(self.flags_at(time(6, 30)), {'Idli', 'Tea'})
+        self.assertEqual(fresh_menu_version(morning + timedelta(minutes=10)), version)
+
+        # Tea's window closes at 07:00; the first read after that flips it
+        later = datetime(2026, 3, 2, 7, 5, tzinfo=business_timezone())
+        self.assertNotEqual(fresh_menu_version(later), version)
+        self.assertEqual(set(FoodItem.objects.available().values_list('food_name', flat=True)), {'Idli'})
+        self.assertEqual(MenuState.objects.get().windows_valid_until, datetime(2026, 3, 2, 11, 0, 0, 1, tzinfo=business_timezone()))
+
+        # Editing a window invalidates the flags immediately
+        with self.captureOnCommitCallbacks(execute=True):
+            SubCategory.objects.filter(subcategory_name='late').get().save()
+        self.assertIsNone(MenuState.objects.get().windows_valid_until)
+
+    def test_filtered_menu_refreshes_expired_windows(self):
+        fresh_menu_version(datetime(2026, 3, 2, 6, 30, tzinfo=business_timezone()))
+        later = datetime(2026, 3, 2, 7, 5, tzinfo=business_timezone())
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get('/api/food-menu/', {'stock_status': 'in_stock'})
+        available = {item['food_name'] for item in response.data if item['is_available_now']}
+        self.assertEqual(available, {'Idli'})
+
+
+class MenuSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tiffin = SubCategory.objects.create(subcategory_name='tiffin', start_time=time(6), end_time=time(11), is_timing_active=True)
+        self.idli = FoodItem.objects.create(food_name='Idli', price=30, subcategory=tiffin)
+        self.tea = FoodItem.objects.create(
+            food_name='Tea', price=15, start_time=time(23), end_time=time(7), is_timing_active=True,
+        )
+        self.tz = business_timezone()
+
+    def at(self, hour, minute=0, second=0):
+        return datetime(2026, 3, 2, hour, minute, second, tzinfo=self.tz)
+
+    def available(self):
+        return set(FoodItem.objects.available().values_list('food_name', flat=True))
+
+    def test_boundaries_flip_flags_and_bump_menu_version(self):
+        scheduler = MenuScheduler()
+        scheduler.rebuild(self.at(5))
+        self.assertEqual(self.available(), {'Tea'})
+        self.assertEqual(len(scheduler.heap), 4)
+        self.assertEqual(scheduler.next_due(), self.at(6))
+
+        version = menu_version()
+        self.assertEqual(scheduler.run_due(self.at(5, 59)), 0)
+        self.assertEqual(scheduler.run_due(self.at(6)), 1)
+        self.assertEqual(self.available(), {'Idli', 'Tea'})
+        self.assertNotEqual(menu_version(), version)
+
+        # Tea closes just after 07:00; the 06:00 entry is rescheduled for tomorrow
+        self.assertEqual(scheduler.run_due(self.at(7, 0, 1)), 1)
+        self.assertEqual(self.available(), {'Idli'})
+        self.assertEqual(scheduler.next_due().date(), self.at(11).date())
+        self.assertIn(self.at(6) + timedelta(days=1), [entry[0] for entry in scheduler.heap])
+
+    def test_edited_window_marks_schedule_stale(self):
+        scheduler = MenuScheduler()
+        scheduler.rebuild(self.at(5))
+        self.assertFalse(scheduler.is_stale())
+        SubCategory.objects.filter(subcategory_name='tiffin').get().save()
+        self.assertTrue(scheduler.is_stale())
+
+
+class MealPeriodStockTests(TestCase):
+    def setUp(self):
+        tiffin, lunch, dinner = (
+            SubCategory.objects.create(subcategory_name=name) for name in ('tiffin', 'lunch', 'dinner')
+        )
+        self.idly = FoodItem.objects.create(food_name='Idly', price=30, subcategory=tiffin)
+        self.vada = FoodItem.objects.create(food_name='Vada', price=20, subcategory=tiffin)
+        self.biryani = FoodItem.objects.create(food_name='Veg Biryani', price=120, subcategory=lunch)
+        self.meals = FoodItem.objects.create(food_name='Meals', price=100, subcategory=lunch)
+        self.chapati = FoodItem.objects.create(
+            food_name='Chapati', price=40, subcategory=dinner, stock_status='out_of_stock',
+        )
+        self.manual = FoodItem.objects.create(food_name='Coffee', price=20, auto_manage_stock=False)
+
+        # The rules 0013 seeds; on a fresh database only 'all' survives 0015, as no subcategories exist
+        subcategories = {'tiffin': tiffin, 'lunch': lunch, 'dinner': dinner}
+        MealPeriodRule.objects.bulk_create([
+            MealPeriodRule(period=period, subcategory=subcategories[name], name_contains=name_contains)
+            for period, name, name_contains in [
+                ('morning', 'tiffin', ''), ('lunch', 'lunch', ''), ('dinner', 'dinner', ''),
+                ('dinner', 'tiffin', 'idly'), ('dinner', 'tiffin', 'dosa'), ('dinner', 'tiffin', 'pongal'),
+                ('dinner', 'lunch', 'biryani'), ('dinner', 'lunch', 'fried rice'), ('dinner', 'lunch', 'noodles'),
+            ]
+        ])
+
+    def apply(self, period):
+        return APIClient().post('/api/food-menu/apply_timing_stock/', {'timing_type': period}, format='json')
+
+    def in_stock(self):
+        return set(FoodItem.objects.filter(stock_status='in_stock').values_list('food_name', flat=True))
+
+    def test_rules_flip_only_changed_items(self):
+        response = self.apply('dinner')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['in_stock_ids'], [self.chapati.food_id])
+        self.assertEqual(response.data['out_of_stock_ids'], sorted([self.vada.food_id, self.meals.food_id]))
+        self.assertEqual(response.data['updated_count'], 3)
+        self.assertEqual(self.in_stock(), {'Idly', 'Veg Biryani', 'Chapati', 'Coffee'})
+
+        self.assertEqual(self.apply('dinner').data['updated_count'], 0)
+        self.assertEqual(self.apply('morning').data['in_stock_ids'], [self.vada.food_id])
+        self.assertEqual(self.in_stock(), {'Idly', 'Vada', 'Coffee'})
+        self.apply('all')
+        self.assertEqual(len(self.in_stock()), 6)
+
+    def test_custom_rule_and_unknown_period(self):
+        MealPeriodRule.objects.create(period='late', name_contains='BIRYANI')
+        self.apply('late')
+        self.assertEqual(self.in_stock(), {'Veg Biryani', 'Coffee'})
+        self.assertEqual(self.apply('brunch').status_code, 400)
+
+    def test_rules_reference_subcategories(self):
+        tiffin = SubCategory.objects.get(subcategory_name='tiffin')
+        self.assertEqual(
+            sorted(tiffin.meal_period_rules.values_list('period', 'name_contains')),
+            [('dinner', 'dosa'), ('dinner', 'idly'), ('dinner', 'pongal'), ('morning', '')],
+        )
+        # "Any subcategory" rules are unique too
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MealPeriodRule.objects.create(period='all')
+
+        self.chapati.delete()
+        SubCategory.objects.get(subcategory_name='dinner').delete()
+        self.assertFalse(MealPeriodRule.objects.filter(period='dinner', name_contains='').exists())
+
+    def test_bulk_update_stock_validates_then_writes_once(self):
+        updates = [
+            {'food_id': self.idly.food_id, 'stock_status': 'out_of_stock', 'stock_notes': 'Batter over'},
+            {'food_id': self.chapati.food_id, 'stock_status': 'in_stock'},
+            {'food_id': self.vada.food_id, 'stock_status': 'sold_out'},
+            {'food_id': 99999, 'stock_status': 'in_stock'},
+            {'food_id': 'x', 'stock_status': 'in_stock'},
+        ]
+        with self.assertNumQueries(4):  # savepoint, one locked fetch, one CASE UPDATE, release
+            response = APIClient().post('/api/food-menu/bulk_update_stock/', {'updates': updates}, format='json')
+        results = response.data['results']
+        self.assertEqual([result['success'] for result in results], [True, True, False, False, False])
+        self.assertEqual(results[0]['stock_status'], 'out_of_stock')
+        self.assertEqual(results[3]['error'], 'Food item not found')
+        self.assertEqual(self.in_stock(), {'Vada', 'Veg Biryani', 'Meals', 'Chapati', 'Coffee'})
+        self.idly.refresh_from_db()
+        self.assertEqual(self.idly.stock_notes, 'Batter over')
+
+    def test_stock_summary_is_one_query_and_follows_menu_version(self):
+        cache.clear()
+        FoodItem.objects.create(food_name='Old Item', price=10, is_active=False)
+        with self.assertNumQueries(2):
+            summary = APIClient().get('/api/food-menu/stock_summary/').data
+        self.assertEqual(summary['total_items'], 6)
+        self.assertEqual((summary['in_stock_count'], summary['out_of_stock_count']), (5, 1))
+        self.assertEqual(summary['subcategory_stats']['dinner'], {'total': 1, 'in_stock': 0})
+        self.assertEqual(summary['subcategory_stats']['Uncategorized'], {'total': 1, 'in_stock': 1})
 
-# Create your tests here.
+        with self.assertNumQueries(1):  # the menu version
+            APIClient().get('/api/food-menu/stock_summary/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apply('dinner')
+        summary = APIClient().get('/api/food-menu/stock_summary/').data
+        self.assertEqual(summary['in_stock_count'], 4)
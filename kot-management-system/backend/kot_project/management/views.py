@@ -12,14 +12,23 @@ from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from django.shortcuts import get_object_or_404
 from .serializers import FoodItemSerializer,RestaurantTableSerializer,SubCategorySerializer,TableSeatSerializer
-from cashier.models import Order, OrderItem
-from django.db.models import Q
-from django.http import HttpResponse
+from cashier.models import ExportJob, Order, OrderItem
+from cashier.pagination import OrderKeysetPagination
+from cashier.exports import EXPORT_FILE_TYPES, export_path, order_record, stream_csv
+from cashier.filters import ORDER_FILTER_PARAMS, filter_orders
+from cashier.forecast import forecast_demand
+from cashier.business_day import current_business_day
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .menu_cache import bump_menu_version_on_commit, menu_body, menu_etag, menu_version, stock_summary
+from .scheduler import fresh_menu_version
 from datetime import datetime
 from django.core.exceptions import ValidationError
-import csv
 
 logger = logging.getLogger("otp_sender")
 
@@ -189,6 +198,9 @@ class LoginView(APIView):
         }, status=200)
 
         
+MENU_FILTER_PARAMS = ('category', 'subcategory', 'food_type', 'stock_status')
+
+
 class FoodItemViewSet(viewsets.ModelViewSet):
     """
     DRF ViewSet for FoodItem model with stock and timing management
@@ -198,7 +210,7 @@ class FoodItemViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        queryset = FoodItem.objects.filter(is_active=True)
+        queryset = FoodItem.objects.filter(is_active=True).select_related('subcategory')
         
         # Filter by query parameters
         category = self.request.query_params.get('category')
@@ -207,7 +219,7 @@ class FoodItemViewSet(viewsets.ModelViewSet):
             
         subcategory = self.request.query_params.get('subcategory')
         if subcategory:
-            queryset = queryset.filter(subcategory=subcategory)
+            queryset = queryset.filter(subcategory__subcategory_name=subcategory)
             
         food_type = self.request.query_params.get('food_type')
         if food_type:
@@ -220,6 +232,23 @@ class FoodItemViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('category', 'food_name')
 
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/food-menu/ - Unfiltered menu is served from the versioned cache with an ETag
+        """
+        # Both paths read is_in_window
+        version = fresh_menu_version()
+        if any(request.query_params.get(param) for param in MENU_FILTER_PARAMS):
+            return super().list(request, *args, **kwargs)
+
+        etag = menu_etag(version)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(menu_body(version), content_type='application/json')
+        response['ETag'] = etag
+        return response
+
     def destroy(self, request, *args, **kwargs):
         """
         Soft delete implementation
@@ -265,35 +294,60 @@ class FoodItemViewSet(viewsets.ModelViewSet):
         POST /api/food-menu/bulk_update_stock/ - Bulk update stock status
         """
         updates = request.data.get('updates', [])
+        if not isinstance(updates, list):
+            return Response({'error': 'updates must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Validate every entry before touching the database
+        valid_statuses = {choice for choice, _ in FoodItem.STOCK_STATUS_CHOICES}
         results = []
-        
+        requested = []
         for update in updates:
+            food_id = update.get('food_id') if isinstance(update, dict) else None
             try:
-                food_item = FoodItem.objects.get(food_id=update['food_id'])
-                food_item.stock_status = update['stock_status']
-                food_item.stock_notes = update.get('stock_notes', '')
-                food_item.save()
-                
-                results.append({
-                    'food_id': food_item.food_id,
-                    'food_name': food_item.food_name,
-                    'stock_status': food_item.stock_status,
-                    'is_available_now': food_item.is_available_now(),
-                    'success': True
-                })
-            except FoodItem.DoesNotExist:
-                results.append({
-                    'food_id': update['food_id'],
-                    'success': False,
-                    'error': 'Food item not found'
-                })
-            except Exception as e:
+                food_id = int(food_id)
+            except (TypeError, ValueError):
+                results.append({'food_id': food_id, 'success': False, 'error': 'food_id must be an integer'})
+                continue
+            if update.get('stock_status') not in valid_statuses:
                 results.append({
-                    'food_id': update['food_id'],
-                    'success': False,
-                    'error': str(e)
+                    'food_id': food_id, 'success': False,
+                    'error': 'Invalid stock status. Use "in_stock" or "out_of_stock".',
                 })
-        
+                continue
+            results.append(None)
+            requested.append((len(results) - 1, food_id, update))
+
+        with transaction.atomic():
+            food_items = FoodItem.objects.select_for_update().in_bulk({food_id for _, food_id, _ in requested})
+            now = timezone.now()
+            changed = {}
+            for position, food_id, update in requested:
+                food_item = food_items.get(food_id)
+                if food_item is None:
+                    results[position] = {'food_id': food_id, 'success': False, 'error': 'Food item not found'}
+                    continue
+                food_item.stock_status = update['stock_status']
+                food_item.stock_notes = update.get('stock_notes', '')
+                food_item.last_stock_update = food_item.updated_at = now
+                changed[food_id] = food_item
+                results[position] = food_item
+
+            if changed:
+                FoodItem.objects.bulk_update(
+                    changed.values(), ['stock_status', 'stock_notes', 'last_stock_update', 'updated_at'],
+                )
+                bump_menu_version_on_commit()
+
+        results = [
+            {
+                'food_id': result.food_id,
+                'food_name': result.food_name,
+                'stock_status': result.stock_status,
+                'is_available_now': result.is_available_now(),
+                'success': True,
+            } if isinstance(result, FoodItem) else result
+            for result in results
+        ]
         return Response({'results': results})
 
     @action(detail=False, methods=['post'])
@@ -301,41 +355,19 @@ class FoodItemViewSet(viewsets.ModelViewSet):
         """
         POST /api/food-menu/apply_timing_stock/ - Apply timing-based stock
         """
-        timing_type = request.data.get('timing_type')  # 'morning', 'lunch', 'dinner', 'all'
-        
-        food_items = FoodItem.objects.filter(auto_manage_stock=True, is_active=True)
-        updated_count = 0
-        
-        for item in food_items:
-            original_status = item.stock_status
-            
-            if timing_type == 'all':
-                item.stock_status = 'in_stock'
-            elif timing_type == 'morning':
-                # Only tiffin items available in morning
-                item.stock_status = 'in_stock' if item.subcategory == 'tiffin' else 'out_of_stock'
-            elif timing_type == 'lunch':
-                # Only lunch items available
-                item.stock_status = 'in_stock' if item.subcategory == 'lunch' else 'out_of_stock'
-            elif timing_type == 'dinner':
-                # Dinner items + specific tiffin items available
-                is_dinner_item = (
-                    item.subcategory == 'dinner' or
-                    (item.subcategory == 'tiffin' and any(keyword in item.food_name.lower() for keyword in ['idly', 'dosa', 'pongal'])) or
-                    (item.subcategory == 'lunch' and any(keyword in item.food_name.lower() for keyword in ['biryani', 'fried rice', 'noodles']))
-                )
-                item.stock_status = 'in_stock' if is_dinner_item else 'out_of_stock'
-            else:
-                continue
-            
-            if item.stock_status != original_status:
-                item.save()
-                updated_count += 1
-        
+        timing_type = request.data.get('timing_type')  # a MealPeriodRule period: 'morning', 'lunch', 'dinner', 'all'
+
+        flipped = FoodItem.objects.apply_meal_period(timing_type)
+        if flipped is None:
+            return Response({'error': f"No meal period rules for '{timing_type}'"}, status=status.HTTP_400_BAD_REQUEST)
+        stocked_ids, unstocked_ids = flipped
+
         return Response({
             'message': f'{timing_type} timing applied successfully',
-            'updated_count': updated_count,
-            'total_items': len(food_items)
+            'updated_count': len(stocked_ids) + len(unstocked_ids),
+            'in_stock_ids': stocked_ids,
+            'out_of_stock_ids': unstocked_ids,
+            'total_items': FoodItem.objects.filter(auto_manage_stock=True, is_active=True).count(),
         })
 
     @action(detail=False, methods=['get'])
@@ -343,26 +375,32 @@ class FoodItemViewSet(viewsets.ModelViewSet):
         """
         GET /api/food-menu/stock_summary/ - Get stock statistics
         """
-        total_items = FoodItem.objects.filter(is_active=True).count()
-        in_stock_count = FoodItem.objects.filter(stock_status='in_stock', is_active=True).count()
-        out_of_stock_count = FoodItem.objects.filter(stock_status='out_of_stock', is_active=True).count()
-        
-        # Count by subcategory
-        subcategory_stats = {}
-        for item in FoodItem.objects.filter(is_active=True):
-            subcat = item.subcategory or 'Uncategorized'
-            if subcat not in subcategory_stats:
-                subcategory_stats[subcat] = {'total': 0, 'in_stock': 0}
-            subcategory_stats[subcat]['total'] += 1
-            if item.stock_status == 'in_stock':
-                subcategory_stats[subcat]['in_stock'] += 1
-        
+        return Response(stock_summary(menu_version()))
+
+    @action(detail=False, methods=['get'])
+    def demand_forecast(self, request):
+        """
+        GET /api/food-menu/demand_forecast/?date=YYYY-MM-DD&weeks=52 - Expected quantities per item
+        Defaults to the next business day.
+        """
+        try:
+            date_param = request.query_params.get('date')
+            target = datetime.strptime(date_param, "%Y-%m-%d").date() if date_param else None
+            weeks = int(request.query_params.get('weeks', 0)) or None
+        except ValueError:
+            return Response({'error': 'Use date=YYYY-MM-DD and a whole number of weeks'}, status=status.HTTP_400_BAD_REQUEST)
+        if weeks is not None and not 1 <= weeks <= 260:
+            return Response({'error': 'weeks must be between 1 and 260'}, status=status.HTTP_400_BAD_REQUEST)
+
+        forecast = forecast_demand(target, weeks=weeks)
+        stock = dict(FoodItem.objects.filter(food_id__in=[row['food_id'] for row in forecast])
+                     .values_list('food_id', 'stock_status'))
+        for row in forecast:
+            row['stock_status'] = stock.get(row['food_id'])
+
         return Response({
-            'total_items': total_items,
-            'in_stock_count': in_stock_count,
-            'out_of_stock_count': out_of_stock_count,
-            'availability_rate': round((in_stock_count / total_items) * 100, 2) if total_items > 0 else 0,
-            'subcategory_stats': subcategory_stats
+            'date': (target or current_business_day() + timedelta(days=1)).isoformat(),
+            'items': forecast,
         })
 
     # ────── TIMING MANAGEMENT ACTIONS ──────
@@ -393,8 +431,9 @@ class FoodItemViewSet(viewsets.ModelViewSet):
             start_time = parse_time(start_time_str) if start_time_str else None
             end_time = parse_time(end_time_str) if end_time_str else None
 
-            if start_time and end_time and start_time >= end_time:
-                return Response({"error": "Start time must be before end time"}, status=400)
+            # An end before the start is an overnight window (e.g. 22:00 - 02:00)
+            if start_time and end_time and start_time == end_time:
+                return Response({"error": "Start and end time must differ"}, status=400)
 
             food_item.start_time = start_time
             food_item.end_time = end_time
@@ -418,7 +457,8 @@ class FoodItemViewSet(viewsets.ModelViewSet):
         """
         GET /api/food-menu/available_items/ - Get only available items
         """
-        available_items = [item for item in FoodItem.objects.filter(is_active=True) if item.is_available_now()]
+        fresh_menu_version()
+        available_items = FoodItem.objects.available().select_related('subcategory').order_by('category', 'food_name')
         serializer = self.get_serializer(available_items, many=True)
         return Response(serializer.data)
 
@@ -438,11 +478,9 @@ class FoodItemViewSet(viewsets.ModelViewSet):
         """
         GET /api/food-menu/subcategories/ - Get all available subcategories from FoodItems
         """
-        subcategories = FoodItem.objects.filter(is_active=True)\
-            .exclude(subcategory__isnull=True)\
-            .exclude(subcategory='')\
-            .values_list('subcategory', flat=True)\
-            .distinct()
+        subcategories = SubCategory.objects.filter(
+            Exists(FoodItem.objects.filter(is_active=True, subcategory=OuterRef('pk')))
+        ).values_list('subcategory_name', flat=True)
         return Response(list(subcategories))
 
 
@@ -457,7 +495,7 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         # Check if subcategory is being used in any food items
-        if FoodItem.objects.filter(subcategory=instance.subcategory_name).exists():
+        if instance.food_items.exists():
             return Response(
                 {
                     "error": f"Cannot delete subcategory '{instance.subcategory_name}'. It is being used in food items."
@@ -494,13 +532,9 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         """
         GET /api/subcategories/available/ - Get subcategories not used in food items
         """
-        used_subcategories = FoodItem.objects.filter(is_active=True)\
-            .exclude(subcategory__isnull=True)\
-            .exclude(subcategory='')\
-            .values_list('subcategory', flat=True)\
-            .distinct()
-        
-        available = SubCategory.objects.exclude(subcategory_name__in=used_subcategories)
+        available = SubCategory.objects.filter(
+            ~Exists(FoodItem.objects.filter(is_active=True, subcategory=OuterRef('pk')))
+        ).order_by('subcategory_name')
         serializer = self.get_serializer(available, many=True)
         return Response(serializer.data)
 
@@ -702,127 +736,104 @@ class TableSeatViewSet(viewsets.ModelViewSet):
 
 class OrderHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
+    pagination_class = OrderKeysetPagination
 
     def get_queryset(self):
         # Remove 'table' and use 'waiter' instead
-        return Order.objects.select_related('waiter').prefetch_related('items').order_by('-created_at')
+        return Order.objects.select_related('waiter').prefetch_related('items').order_by('-created_at', '-order_id')
 
     def list(self, request, *args, **kwargs):
         try:
             qs = self.get_queryset()
             qs = self.apply_filters(qs, request)
-            
-            orders = []
-            for order in qs:
-                orders.append({
-                    "order_id": order.order_id,
-                    "table_number": order.table_number,
-                    "total_amount": str(order.total_amount),
-                    "received_amount": str(order.received_amount),
-                    "balance_amount": str(order.balance_amount),
-                    "payment_mode": order.payment_mode,
-                    "status": order.status,
-                    "created_at": order.created_at.isoformat(),
-                    "paid_at": order.paid_at.isoformat() if order.paid_at else None,
-                    # Include waiter information if needed
-                    "waiter": order.waiter.username if order.waiter else None,
-                    "items": [
-                        {
-                            "name": item.name,
-                            "quantity": item.quantity,
-                            "price": str(item.price),
-                            "subtotal": str(item.subtotal()),
-                        }
-                        for item in order.items.all()
-                    ],
-                })
+
+            # Keyset page when ?cursor= / ?page_size= is sent, full list otherwise
+            page = self.paginate_queryset(qs)
+            if page is not None:
+                qs = page
+
+            orders = [order_record(order, order.items.all()) for order in qs]
+            if page is not None:
+                return Response({"orders": orders, "next": self.paginator.get_next_link()})
             return Response({"orders": orders})
+        except NotFound:
+            raise
         except Exception as e:
             print(f"Error in list view: {str(e)}")
             return Response({"error": "Internal server error"}, status=500)
 
     def apply_filters(self, qs, request):
         """Apply filters to queryset"""
-        table_number = request.query_params.get('table_number')
-        status = request.query_params.get('status')
-        payment_mode = request.query_params.get('payment_mode')
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-        search = request.query_params.get('search', '').strip()
-        today = request.query_params.get('today')
-        yesterday = request.query_params.get('yesterday')
-
-        if table_number:
-            try:
-                qs = qs.filter(table_number=int(table_number))
-            except ValueError:
-                pass
-        if status:
-            qs = qs.filter(status=status)
-        if payment_mode:
-            qs = qs.filter(payment_mode=payment_mode)
-        if date_from:
-            try:
-                from_dt = datetime.strptime(date_from, "%Y-%m-%d").date()
-                qs = qs.filter(created_at__date__gte=from_dt)
-            except ValueError:
-                pass
-        if date_to:
-            try:
-                to_dt = datetime.strptime(date_to, "%Y-%m-%d").date()
-                qs = qs.filter(created_at__date__lte=to_dt)
-            except ValueError:
-                pass
-        if search:
-            qs = qs.filter(
-                Q(order_id__icontains=search) |
-                Q(items__name__icontains=search)
-            ).distinct()
-
-        if today == '1':
-            qs = qs.filter(created_at__date=timezone.now().date())
-        elif yesterday == '1':
-            qs = qs.filter(created_at__date=timezone.now().date() - timedelta(days=1))
-
-        return qs
+        return filter_orders(qs, request.query_params)
 
     @action(detail=False, methods=['get'], url_path='download-csv')
     def download_csv(self, request):
         qs = self.get_queryset()
         qs = self.apply_filters(qs, request)
 
-        # IMPORTANT: Select + prefetch to avoid N+1 queries
-        qs = qs.select_related('waiter').prefetch_related('items').iterator(chunk_size=1000)
-
-        response = HttpResponse(content_type='text/csv')
+        # Streamed from a server-side cursor; items are fetched per chunk of orders
+        response = StreamingHttpResponse(stream_csv(qs), content_type='text/csv')
         filename = f"order_history_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
-        writer = csv.writer(response)
-        writer.writerow([
-            'Order ID', 'Table', 'Items', 'Total (₹)', 'Received (₹)', 'Balance (₹)',
-            'Payment Mode', 'Status', 'Waiter', 'Created At', 'Paid At'
-        ])
-
-        for order in qs:
-            # Build items string safely using prefetched data
-            items_str = '; '.join(
-                f"{item.quantity}x {item.name} @ ₹{item.price}"
-                for item in order.items.all()  # Now safe because prefetched
-            )
-
-            writer.writerow([
-                order.order_id,
-                order.table_number or '',
-                items_str,
-                str(order.total_amount or 0),
-                str(order.received_amount or 0),
-                str(order.balance_amount or 0),
-                (order.payment_mode or '').capitalize(),
-                (order.status or '').capitalize(),
-                order.waiter.username if order.waiter else 'No Waiter',
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                order.paid_at.strftime('%Y-%m-%d %H:%M:%S') if order.paid_at else '-',
-            ])
-
-        return response
\ No newline at end of file
+    # ──────────────────────────────────────────────────────────────
+    # Background exports (processed by manage.py run_export_worker)
+    # ──────────────────────────────────────────────────────────────
+    @action(detail=False, methods=['post'], url_path='exports')
+    def create_export(self, request):
+        """
+        POST /api/orders/exports/
+        Body: {"format": "csv" | "ndjson" | "xlsx", ...order history filters}
+        Filters may also be sent as query params.
+        """
+        export_format = request.data.get('format', 'csv')
+        if export_format not in dict(ExportJob.FORMAT_CHOICES):
+            return Response({"error": "format must be one of csv, ndjson, xlsx"}, status=400)
+
+        filters = {}
+        for key in ORDER_FILTER_PARAMS:
+            value = request.data.get(key, request.query_params.get(key))
+            if value not in (None, ''):
+                filters[key] = str(value)
+
+        job = ExportJob.objects.create(
+            format=export_format,
+            filters=filters,
+            requested_by=request.user if request.user.is_authenticated else None,
+        )
+        return Response(self._export_status(job), status=202)
+
+    @action(detail=False, methods=['get'], url_path=r'exports/(?P<job_id>[0-9a-f-]{36})')
+    def export_status(self, request, job_id=None):
+        """GET /api/orders/exports/<job_id>/"""
+        job = get_object_or_404(ExportJob, pk=job_id)
+        return Response(self._export_status(job))
+
+    @action(detail=False, methods=['get'], url_path=r'exports/(?P<job_id>[0-9a-f-]{36})/download')
+    def download_export(self, request, job_id=None):
+        """GET /api/orders/exports/<job_id>/download/"""
+        job = get_object_or_404(ExportJob, pk=job_id)
+        if job.status != 'done':
+            return Response({"error": f"Export is {job.status}"}, status=409)
+        path = export_path(job)
+        if not path.exists():
+            return Response({"error": "Export file has expired"}, status=410)
+
+        suffix, content_type = EXPORT_FILE_TYPES[job.format]
+        filename = f"order_history_{timezone.localtime(job.created_at).strftime('%Y%m%d_%H%M%S')}.{suffix}"
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+    def _export_status(self, job):
+        return {
+            "job_id": str(job.pk),
+            "format": job.format,
+            "status": job.status,
+            "progress": job.progress,
+            "processed_rows": job.processed_rows,
+            "total_rows": job.total_rows,
+            "error": job.error,
+            "created_at": job.created_at.isoformat(),
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "download_url": f"/api/orders/exports/{job.pk}/download/" if job.status == 'done' else None,
+        }